@@ -0,0 +1,163 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator, Optional
+
+from agents import metrics
+
+AGENT_MAX_CONCURRENCY = int(os.environ.get('AGENT_MAX_CONCURRENCY', '8'))
+AGENT_MAX_QUEUE = int(os.environ.get('AGENT_MAX_QUEUE', '16'))
+AGENT_QUEUE_TIMEOUT = float(os.environ.get('AGENT_QUEUE_TIMEOUT', '10'))
+# Smoothing of the average run time behind Retry-After.
+RUN_SECONDS_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    '''Raised when an agent run is shed: the queue is full or the wait ran past the queue timeout.'''
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    '''One admitted run. Releasing twice is harmless, so a stream can release from several exit paths.'''
+
+    def __init__(self, admission: 'Admission'):
+        self._admission = admission
+        self._start = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._admission._release(time.perf_counter() - self._start)
+
+    async def aclose(self):
+        '''Awaitable `release`, e.g. for a response BackgroundTask.'''
+        self.release()
+
+    async def hold(self, events: AsyncGenerator) -> AsyncIterator:
+        '''Yield from `events` and release once it ends, fails or is closed.'''
+        try:
+            async with aclosing(events) as inner:
+                async for item in inner:
+                    yield item
+        finally:
+            self.release()
+
+
+class Admission:
+    '''
+    Per-process admission control for agent runs.
+
+    At most `limit` runs execute at once; up to `max_queue` more wait in
+    FIFO order for at most `queue_timeout` seconds. Anything beyond that is
+    rejected right away with a Retry-After estimate, so a traffic spike is
+    shed at the door instead of slowing every run down while they all
+    compete for the same LLM and SerpAPI quota. Must be used from one event loop.
+    '''
+
+    def __init__(self, limit: int = AGENT_MAX_CONCURRENCY, max_queue: int = AGENT_MAX_QUEUE,
+                 queue_timeout: float = AGENT_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._lock = threading.Lock()  # guards the counters for stats() from other threads
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._run_seconds: Optional[float] = None
+
+    def retry_after(self) -> int:
+        '''Seconds until a slot is likely free: the queue ahead drained at the average run time.'''
+        run_seconds = self._run_seconds or 1.0
+        return max(1, math.ceil(run_seconds * (len(self._waiters) + 1) / max(self.limit, 1)))
+
+    def _admit(self, waited: float) -> Ticket:
+        with self._lock:
+            self.admitted += 1
+            self._wait_seconds += waited
+            self._max_wait_seconds = max(self._max_wait_seconds, waited)
+        return Ticket(self)
+
+    def _release(self, seconds: float):
+        with self._lock:
+            self._run_seconds = seconds if self._run_seconds is None else (
+                RUN_SECONDS_ALPHA * seconds + (1 - RUN_SECONDS_ALPHA) * self._run_seconds)
+        self._hand_over()
+
+    def _hand_over(self):
+        # Give the slot straight to the next waiter, so a new arrival can't overtake the queue.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _leave_queue(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # Handed a slot just as we gave up: pass it on.
+            self._hand_over()
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    async def admit(self) -> Ticket:
+        '''Wait for a run slot; raises AdmissionRejected if the queue is full or the wait times out.'''
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            return self._admit(0.0)
+        if len(self._waiters) >= self.max_queue:
+            with self._lock:
+                self.rejected += 1
+            raise AdmissionRejected('Too many agent runs in progress, retry later', self.retry_after())
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        with self._lock:
+            self.queued += 1
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._leave_queue(waiter)
+            raise
+        if not waiter.done():
+            self._leave_queue(waiter)
+            with self._lock:
+                self.timed_out += 1
+            raise AdmissionRejected(f'No agent run slot free within {self.queue_timeout:g}s, retry later',
+                                    self.retry_after())
+        return self._admit(time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'active': self._active,
+                'queue_depth': len(self._waiters),
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'avg_wait_seconds': round(self._wait_seconds / self.admitted, 3) if self.admitted else None,
+                'max_wait_seconds': round(self._max_wait_seconds, 3),
+                'avg_run_seconds': round(self._run_seconds, 3) if self._run_seconds is not None else None,
+            }
+
+
+admission = Admission()
+
+metrics.register('admission', admission.stats)
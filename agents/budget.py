@@ -0,0 +1,92 @@
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:  # the servers import run_config before LangChain is loaded, so these are annotations only
+    from langchain_core.messages import AnyMessage
+    from langchain_core.runnables import RunnableConfig
+
+RUN_DEADLINE = float(os.environ.get('RUN_DEADLINE', '90'))
+RUN_MAX_STEPS = int(os.environ.get('RUN_MAX_STEPS', '6'))
+RUN_MAX_TOOL_CALLS = int(os.environ.get('RUN_MAX_TOOL_CALLS', '12'))
+RUN_ANSWER_RESERVE = float(os.environ.get('RUN_ANSWER_RESERVE', '10'))
+
+FINAL_ANSWER_PROMPT = ('The search budget for this request is used up. Do not call any more tools: '
+                       'answer now with the results you already have and say what could not be looked up.')
+
+
+def run_config(thread_id: str, deadline: float = RUN_DEADLINE, **configurable) -> 'RunnableConfig':
+    '''
+    Config for one agent run on `thread_id`, with its deadline starting now.
+
+    Pass `new_thread=True` when the caller just created `thread_id`, so a
+    durable checkpointer does not look it up in its store.
+    '''
+    return {'configurable': {'thread_id': thread_id, 'deadline': time.time() + deadline, **configurable}}
+
+
+def turn_usage(messages: 'list[AnyMessage]') -> tuple[int, int]:
+    '''LLM steps and tool calls made since the last user message.'''
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+    turn = messages[start + 1:]
+    return sum(isinstance(m, AIMessage) for m in turn), sum(isinstance(m, ToolMessage) for m in turn)
+
+
+@dataclass(frozen=True)
+class RunBudget:
+    '''
+    Limits of one agent run, i.e. one user turn.
+
+    Set per run via `configurable`: `deadline` (absolute epoch seconds, see
+    `run_config`), `max_steps` (LLM calls) and `max_tool_calls`. Without a
+    deadline only the step and tool call limits apply.
+    '''
+    deadline: Optional[float] = None
+    max_steps: int = RUN_MAX_STEPS
+    max_tool_calls: int = RUN_MAX_TOOL_CALLS
+    answer_reserve: float = RUN_ANSWER_RESERVE
+
+    @classmethod
+    def from_config(cls, config: 'Optional[RunnableConfig]') -> 'RunBudget':
+        configurable = (config or {}).get('configurable', {})
+        defaults = cls()
+        return cls(
+            deadline=configurable.get('deadline'),
+            max_steps=configurable.get('max_steps', defaults.max_steps),
+            max_tool_calls=configurable.get('max_tool_calls', defaults.max_tool_calls),
+            answer_reserve=configurable.get('answer_reserve', defaults.answer_reserve),
+        )
+
+    def remaining(self) -> float:
+        return math.inf if self.deadline is None else self.deadline - time.time()
+
+    def tool_time(self) -> float:
+        '''Seconds tools may run while leaving the reserve for the final answer.'''
+        return max(1.0, self.remaining() - self.answer_reserve)
+
+    def tool_allowance(self, messages: 'list[AnyMessage]') -> int:
+        return max(0, self.max_tool_calls - turn_usage(messages)[1])
+
+    def exhausted(self, messages: 'list[AnyMessage]') -> Optional[str]:
+        '''Why the next LLM call must be the final answer, or None while budget is left.'''
+        steps, tool_calls = turn_usage(messages)
+        if steps + 1 >= self.max_steps:
+            return 'max_steps'
+        if tool_calls >= self.max_tool_calls:
+            return 'max_tool_calls'
+        if self.remaining() <= self.answer_reserve:
+            return 'deadline'
+        return None
+
+    def report(self, messages: 'list[AnyMessage]', reason: str) -> dict:
+        steps, tool_calls = turn_usage(messages)
+        return {'exhausted': reason, 'steps': steps + 1, 'tool_calls': tool_calls}
+
+
+def budget_report(message: 'Optional[AnyMessage]') -> Optional[dict]:
+    '''Budget exhaustion recorded on a final answer, None if the run finished within budget.'''
+    return getattr(message, 'response_metadata', {}).get('budget') if message is not None else None
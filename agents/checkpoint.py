@@ -0,0 +1,377 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Iterator, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents import metrics
+from agents.checkpoint_store import PostgresCheckpointStore, SqlCheckpointStore, SqliteCheckpointStore
+
+MAX_THREADS = int(os.environ.get('CHECKPOINT_MAX_THREADS', '1000'))
+MAX_BYTES = int(os.environ.get('CHECKPOINT_MAX_BYTES', str(256 * 1024 * 1024)))
+IDLE_TTL = float(os.environ.get('CHECKPOINT_IDLE_TTL', '3600'))
+SWEEP_INTERVAL = float(os.environ.get('CHECKPOINT_SWEEP_INTERVAL', '60'))
+FLUSH_INTERVAL = float(os.environ.get('CHECKPOINT_FLUSH_INTERVAL', '0.5'))
+FLUSH_BATCH_SIZE = int(os.environ.get('CHECKPOINT_FLUSH_BATCH_SIZE', '200'))
+CHECKPOINT_KEYS = ('thread_id', 'checkpoint_ns', 'checkpoint_id')
+
+
+def _payload_size(value: Any) -> int:
+    # Stored entries are nested tuples of (type, bytes) pairs produced by the serde.
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_payload_size(v) for v in value)
+    return 0
+
+
+class BoundedMemorySaver(MemorySaver):
+    '''
+    Drop-in MemorySaver that keeps process memory bounded.
+
+    Whole threads are evicted least-recently-used first once more than
+    `max_threads` are resident or their approximate serialized size exceeds
+    `max_bytes`, and a background sweeper drops threads idle for longer than
+    `idle_ttl` seconds. An evicted thread simply starts over on its next
+    message, like a thread on a fresh process.
+    '''
+
+    def __init__(self, *, max_threads: int = MAX_THREADS, max_bytes: int = MAX_BYTES,
+                 idle_ttl: float = IDLE_TTL, sweep_interval: float = SWEEP_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._lock = threading.RLock()
+        self._last_used: 'OrderedDict[str, float]' = OrderedDict()
+        self._thread_bytes: dict[str, int] = {}
+        self._bytes = 0
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+        self._stop = threading.Event()
+        if sweep_interval > 0 and idle_ttl > 0:
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,),
+                                             name='checkpoint-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _touch(self, thread_id: str):
+        self._last_used[thread_id] = time.monotonic()
+        self._last_used.move_to_end(thread_id)
+
+    def _grow(self, thread_id: str, size: int):
+        self._thread_bytes[thread_id] = self._thread_bytes.get(thread_id, 0) + size
+        self._bytes += size
+
+    def _evict(self, thread_id: str):
+        self._last_used.pop(thread_id, None)
+        self._bytes -= self._thread_bytes.pop(thread_id, 0)
+        self.storage.pop(thread_id, None)
+        for key in [key for key in self.writes if key[0] == thread_id]:
+            del self.writes[key]
+        # Newer checkpoint releases keep channel values in a separate blob store.
+        blobs = getattr(self, 'blobs', None)
+        if blobs is not None:
+            for key in [key for key in blobs if key[0] == thread_id]:
+                del blobs[key]
+
+    def _enforce_limits(self, keep: str):
+        while len(self._last_used) > 1 and (len(self._last_used) > self.max_threads or self._bytes > self.max_bytes):
+            oldest = next(iter(self._last_used))
+            if oldest == keep:
+                break
+            self._evict(oldest)
+            self.evicted_lru += 1
+
+    def sweep(self) -> int:
+        '''Evict threads idle for longer than `idle_ttl`; returns how many were dropped.'''
+        cutoff = time.monotonic() - self.idle_ttl
+        with self._lock:
+            idle = [thread_id for thread_id, used in self._last_used.items() if used < cutoff]
+            for thread_id in idle:
+                self._evict(thread_id)
+            self.evicted_idle += len(idle)
+        return len(idle)
+
+    def _sweep_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            self.sweep()
+
+    def close(self):
+        self._stop.set()
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config['configurable']['thread_id']
+        with self._lock:
+            if thread_id in self._last_used:
+                self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], **kwargs) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            return iter(list(super().list(config, **kwargs)))
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config['configurable']['thread_id']
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            checkpoint_ns = next_config['configurable'].get('checkpoint_ns', '')
+            stored = self.storage[thread_id][checkpoint_ns].get(next_config['configurable']['checkpoint_id'])
+            blobs = getattr(self, 'blobs', {})
+            stored_blobs = [blobs.get((thread_id, checkpoint_ns, channel, version))
+                            for channel, version in new_versions.items()]
+            self._grow(thread_id, _payload_size(stored) + _payload_size(stored_blobs))
+            self._touch(thread_id)
+            self._enforce_limits(keep=thread_id)
+            return next_config
+
+    def put_writes(self, config: RunnableConfig, writes, task_id: str) -> None:
+        thread_id = config['configurable']['thread_id']
+        key = (thread_id, config['configurable'].get('checkpoint_ns', ''), config['configurable']['checkpoint_id'])
+        with self._lock:
+            before = _payload_size(list(self.writes.get(key, {}).values()))
+            super().put_writes(config, writes, task_id)
+            self._grow(thread_id, _payload_size(list(self.writes.get(key, {}).values())) - before)
+            self._touch(thread_id)
+            self._enforce_limits(keep=thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs):
+        for item in self.list(config, **kwargs):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes, task_id: str) -> None:
+        return self.put_writes(config, writes, task_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'resident_threads': len(self._last_used),
+                'approx_bytes': self._bytes,
+                'max_threads': self.max_threads,
+                'max_bytes': self.max_bytes,
+                'idle_ttl': self.idle_ttl,
+                'evicted_lru': self.evicted_lru,
+                'evicted_idle': self.evicted_idle,
+            }
+
+
+class WriteBehindSaver(BoundedMemorySaver):
+    '''
+    BoundedMemorySaver backed by a durable SQL store, written behind the request path.
+
+    Graph steps read and write the in-memory tier as before. Every put and
+    put_writes is also queued as a compressed serde payload, and a flusher
+    thread writes the queue to the store in batches, one transaction each.
+    The store keeps only the latest checkpoint of a thread and its pending
+    writes, so older checkpoints of a rebuilt thread are not listed.
+
+    A read of a thread compares the checkpoint ids the store holds for it,
+    one primary key lookup without payloads that async callers run off the
+    event loop, with the ones this saver last saw. A thread that is not
+    resident, because the process restarted or the thread was evicted, is
+    rebuilt from its latest row. A resident thread that another replica has
+    written to since is dropped and rebuilt the same way, so a conversation
+    that moves between replicas never resumes from a stale checkpoint. Rows
+    still queued on the other replica are not visible yet, so a thread
+    should not be served by two replicas within one flush interval. Runs
+    that start a thread pass `new_thread` in their configurable (see
+    `agents.budget.run_config`): nothing can be stored for it yet, so its
+    reads skip the store for that run.
+    '''
+
+    def __init__(self, store: SqlCheckpointStore, *, flush_interval: float = FLUSH_INTERVAL,
+                 batch_size: int = FLUSH_BATCH_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self.batch_size = batch_size
+        self._pending: list[tuple[str, str, str, str, str, bytes]] = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        # Identifies this saver's rows in the shared store.
+        self.writer = uuid.uuid4().hex
+        # checkpoint_ns -> (checkpoint_id, writer) last stored or seen in the store, per resident thread.
+        self._synced: dict[str, dict[str, tuple[str, str]]] = {}
+        self.flushed_rows = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.hydrated = 0
+        self.refreshed = 0
+        self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,),
+                                         name='checkpoint-flusher', daemon=True)
+        self._flusher.start()
+
+    def _enqueue(self, config: RunnableConfig, checkpoint_id: str, kind: str, record: dict):
+        # Run configs also carry callbacks and user settings; only the checkpoint address is durable.
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable'].get('checkpoint_ns', '')
+        record['config'] = {'configurable': {key: config['configurable'][key] for key in CHECKPOINT_KEYS
+                                             if key in config['configurable']}}
+        type_, payload = self.serde.dumps_typed(record)
+        with self._pending_lock:
+            self._pending.append((thread_id, checkpoint_ns, checkpoint_id, kind, type_, zlib.compress(payload)))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        '''Write everything queued so far to the store.'''
+        with self._flush_lock:
+            with self._pending_lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            try:
+                self.store.save(rows, self.writer)
+            except Exception as e:
+                print(f'Checkpoint flush of {len(rows)} rows failed, retrying next cycle: {e}')
+                with self._pending_lock:
+                    self._pending = rows + self._pending
+                    self.write_errors += 1
+                return
+            with self._pending_lock:
+                self.flushed_rows += len(rows)
+                self.batches += 1
+
+    def _flush_loop(self, interval: float):
+        while not self._stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        super().close()
+        self.flush()
+        self.store.close()
+
+    def _rebuild(self, thread_id: str):
+        checkpoints, writes = self.store.load(thread_id)
+        for type_, payload in checkpoints:
+            record = self.serde.loads_typed((type_, zlib.decompress(payload)))
+            BoundedMemorySaver.put(self, record['config'], record['checkpoint'],
+                                   record['metadata'], record['new_versions'])
+        for type_, payload in writes:
+            record = self.serde.loads_typed((type_, zlib.decompress(payload)))
+            BoundedMemorySaver.put_writes(self, record['config'], record['writes'], record['task_id'])
+
+    def _sync(self, config: RunnableConfig):
+        '''Bring the thread of `config` up to date with the store: rebuild it if cold, or if another writer moved it on.'''
+        thread_id = config['configurable']['thread_id']
+        with self._lock:
+            known = self._synced.get(thread_id)
+            if config['configurable'].get('new_thread'):
+                # Started by this run: the store cannot know the thread before this saver writes it.
+                if known is None:
+                    self._synced[thread_id] = {}
+                return
+        with self._pending_lock:
+            queued = any(row[0] == thread_id for row in self._pending)
+        if queued:
+            # The store must see this thread's queued rows before its heads are compared.
+            self.flush()
+        heads = self.store.heads(thread_id)
+        stale = known is not None and any(
+            writer != self.writer and known.get(checkpoint_ns) != (checkpoint_id, writer)
+            for checkpoint_ns, (checkpoint_id, writer) in heads.items())
+        with self._lock:
+            if self._synced.get(thread_id) is not known:
+                return  # another caller synced this thread meanwhile
+            if known is None or stale:
+                if thread_id in self._last_used or thread_id in self.storage:
+                    self._evict(thread_id)
+                if heads:
+                    self._rebuild(thread_id)
+                    if stale:
+                        self.refreshed += 1
+                    else:
+                        self.hydrated += 1
+                self._synced[thread_id] = heads
+
+    def _evict(self, thread_id: str):
+        super()._evict(thread_id)
+        self._synced.pop(thread_id, None)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        self._sync(config)
+        return super().get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], **kwargs) -> Iterator[CheckpointTuple]:
+        if config is not None:
+            self._sync(config)
+        return super().list(config, **kwargs)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config['configurable']['thread_id']
+        with self._lock:
+            self._synced[thread_id] = {**self._synced.get(thread_id, {}),
+                                       config['configurable'].get('checkpoint_ns', ''): (checkpoint['id'], self.writer)}
+        # The stored row replaces the previous checkpoint, so it carries every channel, not just the new ones.
+        self._enqueue(config, checkpoint['id'], 'put', {
+            'checkpoint': checkpoint, 'metadata': metadata, 'new_versions': checkpoint['channel_versions']})
+        return next_config
+
+    def put_writes(self, config: RunnableConfig, writes, task_id: str) -> None:
+        super().put_writes(config, writes, task_id)
+        self._enqueue(config, config['configurable']['checkpoint_id'], 'writes', {
+            'writes': list(writes), 'task_id': task_id})
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        # The store query runs on a worker thread; only the in-memory read happens on the loop.
+        await asyncio.to_thread(self._sync, config)
+        return BoundedMemorySaver.get_tuple(self, config)
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs):
+        if config is not None:
+            await asyncio.to_thread(self._sync, config)
+        for item in BoundedMemorySaver.list(self, config, **kwargs):
+            yield item
+
+    def stats(self) -> dict:
+        report = super().stats()
+        with self._pending_lock:
+            report.update({
+                'backend': type(self.store).__name__,
+                'pending_rows': len(self._pending),
+                'flushed_rows': self.flushed_rows,
+                'batches': self.batches,
+                'write_errors': self.write_errors,
+                'hydrated_threads': self.hydrated,
+                'refreshed_threads': self.refreshed,
+            })
+        return report
+
+
+def create_checkpointer() -> BoundedMemorySaver:
+    '''
+    Build the graph checkpointer selected by CHECKPOINT_BACKEND and report it under /metrics.
+
+    `memory` (default) keeps threads in process only, `sqlite` persists them to
+    CHECKPOINT_SQLITE_PATH and `postgres` to POSTGRES_URI.
+    '''
+    backend = os.environ.get('CHECKPOINT_BACKEND', 'memory')
+    if backend == 'sqlite':
+        saver = WriteBehindSaver(SqliteCheckpointStore(os.environ.get('CHECKPOINT_SQLITE_PATH', 'checkpoints.sqlite')))
+    elif backend == 'postgres':
+        saver = WriteBehindSaver(PostgresCheckpointStore(os.environ['POSTGRES_URI']))
+    elif backend == 'memory':
+        saver = BoundedMemorySaver()
+    else:
+        raise ValueError(f'CHECKPOINT_BACKEND must be memory, sqlite or postgres, got {backend}')
+    metrics.register('checkpointer', saver.stats)
+    return saver
@@ -0,0 +1,156 @@
+import queue
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+try:
+    import psycopg_pool
+except ImportError:  # only needed for CHECKPOINT_BACKEND=postgres
+    psycopg_pool = None
+
+
+class SqlCheckpointStore(ABC):
+    '''
+    Latest checkpoint of every (thread_id, checkpoint_ns), plus the pending writes made on top of it.
+
+    A put upserts the thread's single checkpoint row and drops the writes of
+    the checkpoint it replaced, so storage grows with the size of a
+    conversation, not with the number of steps it took. Rows carry the
+    `writer` that stored them, so a saver can tell which threads another
+    process moved on. Subclasses only provide the dialect and a pooled
+    `connection()`.
+    '''
+
+    placeholder = '?'
+    blob = 'BLOB'
+
+    def setup(self):
+        with self.connection() as conn:
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                writer TEXT NOT NULL,
+                type TEXT NOT NULL,
+                payload {self.blob} NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns)
+            )''')
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS checkpoint_writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                payload {self.blob} NOT NULL
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS checkpoint_writes_thread '
+                         'ON checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id)')
+
+    def save(self, rows: list[tuple[str, str, str, str, str, bytes]], writer: str):
+        '''
+        Store a batch of (thread_id, checkpoint_ns, checkpoint_id, kind, type, payload) rows by `writer`.
+
+        `kind` is `put` or `writes`. Only the last put of each thread in the
+        batch is written, and writes only if they belong to that checkpoint.
+        '''
+        heads = {}
+        for thread_id, checkpoint_ns, checkpoint_id, kind, _, _ in rows:
+            if kind == 'put':
+                heads[thread_id, checkpoint_ns] = checkpoint_id
+        puts, writes = {}, []
+        for thread_id, checkpoint_ns, checkpoint_id, kind, type_, payload in rows:
+            if heads.get((thread_id, checkpoint_ns), checkpoint_id) != checkpoint_id:
+                continue  # superseded within this batch
+            if kind == 'put':
+                puts[thread_id, checkpoint_ns] = (thread_id, checkpoint_ns, checkpoint_id, writer, type_, payload)
+            else:
+                writes.append((thread_id, checkpoint_ns, checkpoint_id, type_, payload))
+        p = self.placeholder
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            if puts:
+                cursor.executemany(
+                    f'INSERT INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, writer, type, payload) '
+                    f'VALUES ({p}, {p}, {p}, {p}, {p}, {p}) ON CONFLICT (thread_id, checkpoint_ns) DO UPDATE SET '
+                    f'checkpoint_id = excluded.checkpoint_id, writer = excluded.writer, '
+                    f'type = excluded.type, payload = excluded.payload', list(puts.values()))
+                cursor.executemany(
+                    f'DELETE FROM checkpoint_writes WHERE thread_id = {p} AND checkpoint_ns = {p} '
+                    f'AND checkpoint_id <> {p}', [(t, ns, c) for t, ns, c, _, _, _ in puts.values()])
+            if writes:
+                cursor.executemany(
+                    f'INSERT INTO checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id, type, payload) '
+                    f'VALUES ({p}, {p}, {p}, {p}, {p})', writes)
+
+    def heads(self, thread_id: str) -> dict[str, tuple[str, str]]:
+        '''checkpoint_ns -> (checkpoint_id, writer) of the stored checkpoints of `thread_id`, without payloads.'''
+        p = self.placeholder
+        with self.connection() as conn:
+            cursor = conn.execute(
+                f'SELECT checkpoint_ns, checkpoint_id, writer FROM checkpoints WHERE thread_id = {p}', (thread_id,))
+            return {checkpoint_ns: (checkpoint_id, writer) for checkpoint_ns, checkpoint_id, writer in cursor.fetchall()}
+
+    def load(self, thread_id: str) -> tuple[list[tuple[str, bytes]], list[tuple[str, bytes]]]:
+        '''(type, payload) pairs of the latest checkpoints of `thread_id` and of the writes made on them.'''
+        p = self.placeholder
+        with self.connection() as conn:
+            checkpoints = conn.execute(
+                f'SELECT type, payload FROM checkpoints WHERE thread_id = {p}', (thread_id,)).fetchall()
+            writes = conn.execute(
+                f'SELECT w.type, w.payload FROM checkpoint_writes w JOIN checkpoints c '
+                f'ON c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns '
+                f'AND c.checkpoint_id = w.checkpoint_id WHERE w.thread_id = {p}', (thread_id,)).fetchall()
+        return ([(type_, bytes(payload)) for type_, payload in checkpoints],
+                [(type_, bytes(payload)) for type_, payload in writes])
+
+    @abstractmethod
+    def connection(self):
+        '''Context manager yielding a connection that commits on success and rolls back on error.'''
+
+    def close(self):
+        pass
+
+
+class SqliteCheckpointStore(SqlCheckpointStore):
+    '''SQLite store for local and offline runs, with a small pool of WAL-mode connections.'''
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self._pool: 'queue.Queue[sqlite3.Connection]' = queue.Queue()
+        for _ in range(pool_size):
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._pool.put(conn)
+        self.setup()
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get().close()
+
+
+class PostgresCheckpointStore(SqlCheckpointStore):
+    '''Postgres store for production, backed by a psycopg connection pool.'''
+
+    placeholder = '%s'
+    blob = 'BYTEA'
+
+    def __init__(self, uri: str, pool_size: int = 4):
+        if psycopg_pool is None:
+            raise ImportError('CHECKPOINT_BACKEND=postgres needs the `psycopg[binary]` and `psycopg-pool` packages')
+        self._pool = psycopg_pool.ConnectionPool(uri, min_size=1, max_size=pool_size, open=True)
+        self.setup()
+
+    def connection(self):
+        return self._pool.connection()
+
+    def close(self):
+        self._pool.close()
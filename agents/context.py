@@ -0,0 +1,94 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from langchain_core.messages import AnyMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+# ~4 characters per token holds well enough for English prose and compact JSON.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@dataclass(frozen=True)
+class ContextPolicy:
+    '''
+    What the LLM gets to see of a conversation.
+
+    The checkpoint always keeps the full history; this only shapes the prompt.
+    Set per run via `configurable`, e.g. `{'context_max_tokens': 4000}`, or
+    process-wide through the CONTEXT_* environment variables.
+    '''
+    max_tokens: int = int(os.environ.get('CONTEXT_MAX_TOKENS', '12000'))
+    window_turns: int = int(os.environ.get('CONTEXT_WINDOW_TURNS', '6'))
+    digest_chars: int = int(os.environ.get('CONTEXT_DIGEST_CHARS', '240'))
+
+    @classmethod
+    def from_config(cls, config: Optional[RunnableConfig]) -> 'ContextPolicy':
+        configurable = (config or {}).get('configurable', {})
+        defaults = cls()
+        return cls(
+            max_tokens=configurable.get('context_max_tokens', defaults.max_tokens),
+            window_turns=configurable.get('context_window_turns', defaults.window_turns),
+            digest_chars=configurable.get('context_digest_chars', defaults.digest_chars),
+        )
+
+
+def estimate_tokens(message: AnyMessage) -> int:
+    '''Cheap local token estimate for one message, including any tool call arguments.'''
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    chars = len(content) + sum(len(str(call.get('args', ''))) for call in getattr(message, 'tool_calls', None) or [])
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+def digest(message: ToolMessage, digest_chars: int) -> ToolMessage:
+    '''Replace a tool result by its head and a note of what was dropped.'''
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if len(content) <= digest_chars:
+        return message
+    return ToolMessage(tool_call_id=message.tool_call_id, name=message.name,
+                       content=f'{content[:digest_chars]}… [{message.name} result, {len(content)} chars trimmed]')
+
+
+def _turn_starts(messages: list[AnyMessage]) -> list[int]:
+    return [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+
+
+def compact_messages(messages: list[AnyMessage], policy: ContextPolicy) -> list[AnyMessage]:
+    '''
+    Build the view of `messages` sent to the LLM.
+
+    Keeps the last `window_turns` user turns, digests tool results of earlier
+    turns and then drops whole turns, oldest first, until the estimate fits
+    `max_tokens`. Cuts only happen at user messages, so tool calls and their
+    results are never separated. The current turn is always kept; if it alone
+    is over budget, its own tool results are digested too, oldest first.
+    '''
+    starts = _turn_starts(messages)
+    if not starts:
+        return list(messages)
+    starts = starts[-policy.window_turns:] if policy.window_turns > 0 else starts[-1:]
+    current = starts[-1]
+    view = [digest(m, policy.digest_chars) if isinstance(m, ToolMessage) and i < current else m
+            for i, m in enumerate(messages) if i >= starts[0]]
+    offsets = [start - starts[0] for start in starts]
+
+    sizes = [estimate_tokens(m) for m in view]
+    total = sum(sizes)
+    cut = 0
+    for offset in offsets[1:]:
+        if total <= policy.max_tokens:
+            break
+        total -= sum(sizes[cut:offset])
+        cut = offset
+    view, sizes = view[cut:], sizes[cut:]
+
+    for i in range(offsets[-1] - cut, len(view)):
+        if total <= policy.max_tokens:
+            break
+        if isinstance(view[i], ToolMessage):
+            view[i] = digest(view[i], policy.digest_chars)
+            size = estimate_tokens(view[i])
+            total -= sizes[i] - size
+            sizes[i] = size
+    return view
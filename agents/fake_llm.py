@@ -0,0 +1,218 @@
+import asyncio
+import datetime
+import json
+import os
+import random
+import re
+import string
+import time
+from dataclasses import fields
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, AnyMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import validator
+
+from agents.intent_cache import TravelSlots, extract_slots
+from agents.tools.backends import parse_latency
+
+CHARS_PER_TOKEN = 4
+
+# A flight search for whatever route the user asked about, then an answer.
+DEFAULT_SCRIPT = [
+    {'tool_calls': [{'name': 'flights_finder', 'args': {'params': {
+        'departure_airport': '{origin}', 'arrival_airport': '{destination}',
+        'outbound_date': '{outbound_date}', 'return_date': '{return_date}', 'adults': '{adults}'}}}]},
+    {'text': 'Here are the best flights from {origin} to {destination} on {outbound_date}, '
+             'with prices in USD and booking links from Google Flights.'},
+]
+
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+PLACEHOLDERS = frozenset(field.name for field in fields(TravelSlots))
+
+
+def _slot_values(query: str) -> dict:
+    '''Values for script placeholders: the slots of the user message, else a fixed trip a month out.'''
+    today = datetime.date.today()
+    values = {
+        'origin': 'MAD', 'destination': 'AMS', 'adults': 1, 'children': 0,
+        'hotel_class': None, 'flights': True, 'hotels': False,
+        'outbound_date': (today + datetime.timedelta(days=30)).isoformat(),
+        'return_date': (today + datetime.timedelta(days=37)).isoformat(),
+    }
+    slots = extract_slots(query, today)
+    if slots is not None:
+        values.update({k: v for k, v in vars(slots).items() if v is not None})
+    return values
+
+
+def _placeholders(value: Any) -> set[str]:
+    '''Every `{name}` referenced in the strings of a script entry.'''
+    if isinstance(value, dict):
+        return set().union(*(_placeholders(v) for v in value.values()))
+    if isinstance(value, list):
+        return set().union(*(_placeholders(v) for v in value))
+    if isinstance(value, str):
+        return {name for _, name, _, _ in string.Formatter().parse(value) if name is not None}
+    return set()
+
+
+def check_script(script: list) -> list:
+    '''Raise ValueError naming every malformed entry or unknown placeholder, before anything is played.'''
+    problems = []
+    for i, entry in enumerate(script):
+        if not isinstance(entry, dict) or not ({'tool_calls', 'text'} & set(entry)):
+            problems.append(f'entry {i} needs a `tool_calls` or `text` key')
+            continue
+        try:
+            unknown = _placeholders(entry) - PLACEHOLDERS
+        except ValueError as e:
+            problems.append(f'entry {i}: {e}')
+            continue
+        if unknown:
+            problems.append(f'entry {i} uses unknown placeholders {", ".join(sorted(unknown))}')
+    if not script:
+        problems.append('the script is empty')
+    if problems:
+        raise ValueError(f'Invalid fake LLM script ({"; ".join(problems)}); '
+                         f'placeholders must be one of {", ".join(sorted(PLACEHOLDERS))}')
+    return script
+
+
+def _fill(value: Any, values: dict) -> Any:
+    if isinstance(value, dict):
+        return {k: _fill(v, values) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, values) for v in value]
+    if isinstance(value, str):
+        whole = _PLACEHOLDER.fullmatch(value)
+        # A lone placeholder keeps the slot's type, e.g. `"{adults}"` becomes 2, not "2".
+        return values[whole.group(1)] if whole else value.format_map(values)
+    return value
+
+
+class ScriptedChatModel(BaseChatModel):
+    '''
+    Deterministic chat model for offline load tests of the graph.
+
+    Each entry of `script` is either `{'tool_calls': [{'name', 'args'}]}` or
+    `{'text': ...}`; the n-th LLM call of a user turn plays entry n (the last
+    entry repeats), and calls bound with `tool_choice='none'` play the last
+    text entry. `{origin}`-style placeholders are filled from the slots of
+    the user message and checked against PLACEHOLDERS when the script loads. Latency is `first_token` plus one `token_rate` interval
+    per output token, both latency specs as in `parse_latency` (token_rate in
+    tokens per second, 0 for instant), sampled from an RNG seeded by the
+    message, so a rerun of the same conversations replays the same timings.
+    '''
+
+    script: list = DEFAULT_SCRIPT
+    first_token: str = 'fixed:0'
+    token_rate: str = 'fixed:0'
+    seed: int = 0
+
+    @validator('script')
+    def _check_script(cls, script: list) -> list:
+        return check_script(script)
+
+    @classmethod
+    def from_env(cls, script_path: Optional[str] = None) -> 'ScriptedChatModel':
+        '''Build from FAKE_LLM_* settings; `script_path` overrides FAKE_LLM_SCRIPT.'''
+        path = script_path or os.environ.get('FAKE_LLM_SCRIPT')
+        kwargs = {}
+        if path:
+            with open(path, encoding='utf-8') as f:
+                kwargs['script'] = json.load(f)
+        return cls(
+            first_token=os.environ.get('FAKE_LLM_FIRST_TOKEN', 'fixed:0'),
+            token_rate=os.environ.get('FAKE_LLM_TOKEN_RATE', 'fixed:0'),
+            seed=int(os.environ.get('FAKE_LLM_SEED', '0')),
+            **kwargs
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return 'scripted-fake'
+
+    def bind_tools(self, tools: list, tool_choice: Optional[str] = None, **kwargs):
+        return self.bind(tool_choice=tool_choice)
+
+    def _message(self, messages: list[AnyMessage], tool_choice: Optional[str]) -> tuple[AIMessage, random.Random]:
+        start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        query = messages[start].content if start >= 0 and isinstance(messages[start].content, str) else ''
+        step = sum(isinstance(m, AIMessage) for m in messages[start + 1:])
+        entries = self.script if tool_choice != 'none' else [e for e in self.script if 'text' in e][-1:]
+        entry = entries[min(step, len(entries) - 1)]
+        values = _slot_values(query)
+        rng = random.Random(f'{self.seed}:{query}:{step}')
+
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        if 'tool_calls' in entry:
+            tool_calls = [{'name': call['name'], 'args': _fill(call['args'], values), 'id': f'call_{step}_{i}'}
+                          for i, call in enumerate(entry['tool_calls'])]
+            message = AIMessage(content='', tool_calls=tool_calls)
+            output_tokens = len(json.dumps([c['args'] for c in tool_calls])) // CHARS_PER_TOKEN
+        else:
+            message = AIMessage(content=_fill(entry['text'], values))
+            output_tokens = len(message.content) // CHARS_PER_TOKEN
+        message.usage_metadata = {'input_tokens': prompt_chars // CHARS_PER_TOKEN, 'output_tokens': output_tokens,
+                                  'total_tokens': prompt_chars // CHARS_PER_TOKEN + output_tokens}
+        return message, rng
+
+    def _delays(self, rng: random.Random) -> tuple[float, float]:
+        '''Seconds to the first token and between tokens.'''
+        first = parse_latency(self.first_token, rng)({})
+        rate = parse_latency(self.token_rate, rng)({})
+        return max(0.0, first), 1.0 / rate if rate > 0 else 0.0
+
+    @staticmethod
+    def _tokens(message: AIMessage) -> list[str]:
+        return re.findall(r'\S+\s*', message.content) or ['']
+
+    def _generate(self, messages: list[AnyMessage], stop: Optional[list[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        message, rng = self._message(messages, kwargs.get('tool_choice'))
+        first, per_token = self._delays(rng)
+        time.sleep(first + per_token * len(self._tokens(message)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: list[AnyMessage], stop: Optional[list[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        message, rng = self._message(messages, kwargs.get('tool_choice'))
+        first, per_token = self._delays(rng)
+        await asyncio.sleep(first + per_token * len(self._tokens(message)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> list[AIMessageChunk]:
+        if message.tool_calls:
+            return [AIMessageChunk(content='', usage_metadata=message.usage_metadata, tool_call_chunks=[
+                {'name': c['name'], 'args': json.dumps(c['args']), 'id': c['id'], 'index': i}
+                for i, c in enumerate(message.tool_calls)])]
+        tokens = self._tokens(message)
+        chunks = [AIMessageChunk(content=token) for token in tokens]
+        chunks[-1].usage_metadata = message.usage_metadata
+        return chunks
+
+    def _stream(self, messages: list[AnyMessage], stop: Optional[list[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message, rng = self._message(messages, kwargs.get('tool_choice'))
+        first, per_token = self._delays(rng)
+        time.sleep(first)
+        for chunk in self._chunks(message):
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+            time.sleep(per_token)
+
+    async def _astream(self, messages: list[AnyMessage], stop: Optional[list[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        message, rng = self._message(messages, kwargs.get('tool_choice'))
+        first, per_token = self._delays(rng)
+        await asyncio.sleep(first)
+        for chunk in self._chunks(message):
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+            await asyncio.sleep(per_token)
@@ -1,15 +1,25 @@
 # pylint: disable = http-used,print-used,no-self-use
 
 import datetime
-import operator
+import time
 from typing import Annotated, TypedDict
 
 from dotenv import load_dotenv
-from langchain_core.messages import AnyMessage, HumanMessage, SystemMessage, ToolMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.callbacks.manager import adispatch_custom_event, dispatch_custom_event
+from langchain_core.messages import AIMessage, AnyMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.graph import END, StateGraph
-
+from langgraph.graph.message import add_messages
+
+from agents.budget import FINAL_ANSWER_PROMPT, RunBudget, budget_report, turn_usage
+from agents.checkpoint import create_checkpointer
+from agents.context import ContextPolicy, compact_messages
+from agents.llm import ModelRouting, chat_model, node_stats
+from agents.prefetch import prefetch_enabled, prefetcher
+from agents.render import plan_complete, render_enabled, render_turn
+from agents.streaming import DRAFT_TAG, RENDER_EVENT, TOOL_END_EVENT, TOOL_START_EVENT
+from agents.tool_executor import TOOL_CALL_TIMEOUT, arun_tool_calls, run_tool_calls, skipped_tool_calls
+from agents.tools.fare_matrix import fare_matrix
 from agents.tools.flights_finder import flights_finder
 from agents.tools.hotels_finder import hotels_finder
 
@@ -19,7 +29,8 @@ CURRENT_YEAR = datetime.datetime.now().year
 
 
 class AgentState(TypedDict):
-    messages: Annotated[list[AnyMessage], operator.add]
+    # add_messages appends, but replaces a message with the same id (the synthesized answer replaces the draft)
+    messages: Annotated[list[AnyMessage], add_messages]
 
 
 TOOLS_SYSTEM_PROMPT = f"""You are a smart travel agency. Use the tools to look up information.
@@ -27,6 +38,7 @@ TOOLS_SYSTEM_PROMPT = f"""You are a smart travel agency. Use the tools to look u
     Only look up information when you are sure of what you want.
     The current year is {CURRENT_YEAR}.
     If you need to look up some information before asking a follow up question, you are allowed to do that!
+    If the user is flexible on dates, call fare_matrix once instead of calling flights_finder date by date.
     I want to have in your output links to hotels websites and flights websites (if possible).
     I want to have as well the logo of the hotel and the logo of the airline company (if possible).
     In your output always include the price of the flight and the price of the hotel and the currency as well (if possible).
@@ -35,41 +47,170 @@ TOOLS_SYSTEM_PROMPT = f"""You are a smart travel agency. Use the tools to look u
     Total: $3,488
     """
 
-TOOLS = [flights_finder, hotels_finder]
+PLANNER_DONE_PROMPT = """
+    The tool results are in. If no more tool calls are needed, reply with just DONE: the answer is written separately.
+    """
+
+TOOLS = [flights_finder, hotels_finder, fare_matrix]
 
 
 class TravelAgent:
     def __init__(self):
         self._tools = {t.name: t for t in TOOLS}
-        self._tools_llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            temperature=0.1
-        ).bind_tools(TOOLS)
+        self._bound = {}
+
+    def _model(self, name: str, tools: bool = True):
+        if (name, tools) not in self._bound:
+            llm = chat_model(name)
+            # tool_choice='none' keeps the schemas the history's tool calls refer to but forbids new calls
+            self._bound[name, tools] = llm.bind_tools(TOOLS) if tools else llm.bind_tools(TOOLS, tool_choice='none')
+        return self._bound[name, tools]
 
     @staticmethod
-    def exists_action(state: AgentState):
+    def _drafting(state: AgentState, routing: ModelRouting) -> bool:
+        # With a synthesis model, the planner's reply after tool results is only a draft.
+        return routing.synthesis and turn_usage(state['messages'])[1] > 0
+
+    @staticmethod
+    def exists_action(state: AgentState, config: RunnableConfig):
         result = state['messages'][-1]
-        if len(result.tool_calls) == 0:
-            return END
-        return 'invoke_tools'
-
-    def call_tools_llm(self, state: AgentState):
-        messages = state['messages']
-        messages = [SystemMessage(content=TOOLS_SYSTEM_PROMPT)] + messages
-        message = self._tools_llm.invoke(messages)
+        if len(result.tool_calls) > 0:
+            return 'invoke_tools'
+        if budget_report(result) is None and TravelAgent._drafting(state, ModelRouting.from_config(config)):
+            return 'synthesize'
+        return END
+
+    @staticmethod
+    def prefetch(state: AgentState, config: RunnableConfig):
+        # Speculative searches overlap SerpAPI latency with the planner's LLM call.
+        if prefetch_enabled(config):
+            prefetcher.start(state['messages'])
+        return {'messages': []}
+
+    @staticmethod
+    async def aprefetch(state: AgentState, config: RunnableConfig):
+        if prefetch_enabled(config):
+            prefetcher.astart(state['messages'])
+        return {'messages': []}
+
+    @staticmethod
+    def _prompt(messages: list[AnyMessage], config: RunnableConfig, note: str = ''):
+        # The checkpoint keeps the full history; the model only sees the compacted view.
+        messages = compact_messages(messages, ContextPolicy.from_config(config))
+        return [SystemMessage(content=TOOLS_SYSTEM_PROMPT + note)] + messages
+
+    def _llm_step(self, state: AgentState, config: RunnableConfig):
+        routing = ModelRouting.from_config(config)
+        budget = RunBudget.from_config(config)
+        reason = budget.exhausted(state['messages'])
+        if reason is not None:
+            print(f'Run budget exhausted ({reason}), forcing a final answer')
+            return (routing.answer_model, self._model(routing.answer_model, tools=False),
+                    self._prompt(state['messages'], config, FINAL_ANSWER_PROMPT), budget.report(state['messages'], reason))
+        llm = self._model(routing.planner_model)
+        if self._drafting(state, routing):
+            return (routing.planner_model, llm.with_config(tags=[DRAFT_TAG]),
+                    self._prompt(state['messages'], config, PLANNER_DONE_PROMPT), None)
+        return routing.planner_model, llm, self._prompt(state['messages'], config), None
+
+    @staticmethod
+    def _finish(message: AIMessage, report: dict):
+        if report is None:
+            return {'messages': [message]}
+        # A forced answer must never route back to the tools, and callers read the report from its metadata.
+        message = message.copy(update={'tool_calls': [], 'response_metadata': {**message.response_metadata, 'budget': report}})
         return {'messages': [message]}
 
-    def invoke_tools(self, state: AgentState):
+    def call_tools_llm(self, state: AgentState, config: RunnableConfig):
+        model, llm, messages, report = self._llm_step(state, config)
+        start = time.perf_counter()
+        message = llm.invoke(messages)
+        node_stats.record('call_tools_llm', model, time.perf_counter() - start, message)
+        return self._finish(message, report)
+
+    async def acall_tools_llm(self, state: AgentState, config: RunnableConfig):
+        model, llm, messages, report = self._llm_step(state, config)
+        start = time.perf_counter()
+        message = await llm.ainvoke(messages)
+        node_stats.record('call_tools_llm', model, time.perf_counter() - start, message)
+        return self._finish(message, report)
+
+    def _synthesis_step(self, state: AgentState, config: RunnableConfig):
+        model = ModelRouting.from_config(config).synthesis_model
+        draft = state['messages'][-1]
+        return model, self._model(model, tools=False), self._prompt(state['messages'][:-1], config), draft.id
+
+    def synthesize(self, state: AgentState, config: RunnableConfig):
+        model, llm, messages, draft_id = self._synthesis_step(state, config)
+        start = time.perf_counter()
+        message = llm.invoke(messages)
+        node_stats.record('synthesize', model, time.perf_counter() - start, message)
+        # Same id as the planner's draft, so the answer replaces it in the history.
+        return {'messages': [message.copy(update={'id': draft_id})]}
+
+    async def asynthesize(self, state: AgentState, config: RunnableConfig):
+        model, llm, messages, draft_id = self._synthesis_step(state, config)
+        start = time.perf_counter()
+        message = await llm.ainvoke(messages)
+        node_stats.record('synthesize', model, time.perf_counter() - start, message)
+        return {'messages': [message.copy(update={'id': draft_id})]}
+
+    @staticmethod
+    def after_tools(state: AgentState, config: RunnableConfig):
+        # A finished plan of plain searches can be formatted locally, which saves the LLM call
+        # that would only reformat them. Anything else goes back to the LLM for its next step.
+        if (render_enabled(config) and plan_complete(state['messages'])
+                and render_turn(state['messages']) is not None):
+            return 'render'
+        return 'call_tools_llm'
+
+    @staticmethod
+    def render(state: AgentState, config: RunnableConfig):
+        lines = render_turn(state['messages'])
+        for line in lines:
+            dispatch_custom_event(RENDER_EVENT, {'text': line + '\n'}, config=config)
+        return {'messages': [AIMessage(content='\n'.join(lines), response_metadata={'rendered': True})]}
+
+    @staticmethod
+    async def arender(state: AgentState, config: RunnableConfig):
+        lines = render_turn(state['messages'])
+        for line in lines:
+            await adispatch_custom_event(RENDER_EVENT, {'text': line + '\n'}, config=config)
+        return {'messages': [AIMessage(content='\n'.join(lines), response_metadata={'rendered': True})]}
+
+    @staticmethod
+    def _tool_calls(state: AgentState, config: RunnableConfig):
+        budget = RunBudget.from_config(config)
         tool_calls = state['messages'][-1].tool_calls
-        results = []
-        for t in tool_calls:
-            print(f'Calling: {t}')
-            if not t['name'] in self._tools:  # check for bad tool name from LLM
-                print('\n ....bad tool name....')
-                result = 'bad tool name, retry'  # instruct LLM to retry if bad
-            else:
-                result = self._tools[t['name']].invoke(t['args'])
-            results.append(ToolMessage(tool_call_id=t['id'], name=t['name'], content=str(result)))
+        allowed = budget.tool_allowance(state['messages'])
+        return tool_calls[:allowed], tool_calls[allowed:], min(TOOL_CALL_TIMEOUT, budget.tool_time())
+
+    @staticmethod
+    def _tool_end(message: ToolMessage) -> dict:
+        return {'id': message.tool_call_id, 'name': message.name, **message.response_metadata}
+
+    def invoke_tools(self, state: AgentState, config: RunnableConfig):
+        tool_calls, skipped, timeout = self._tool_calls(state, config)
+        for tool_call in tool_calls + skipped:
+            dispatch_custom_event(TOOL_START_EVENT, tool_call, config=config)
+        results = run_tool_calls(self._tools, tool_calls, timeout) + skipped_tool_calls(skipped)
+        for message in results:
+            dispatch_custom_event(TOOL_END_EVENT, self._tool_end(message), config=config)
+        print('Back to the model!')
+        return {'messages': results}
+
+    async def ainvoke_tools(self, state: AgentState, config: RunnableConfig):
+        tool_calls, skipped, timeout = self._tool_calls(state, config)
+        for tool_call in tool_calls + skipped:
+            await adispatch_custom_event(TOOL_START_EVENT, tool_call, config=config)
+
+        async def tool_end(message: ToolMessage):
+            await adispatch_custom_event(TOOL_END_EVENT, self._tool_end(message), config=config)
+
+        results = await arun_tool_calls(self._tools, tool_calls, timeout, on_result=tool_end)
+        for message in skipped_tool_calls(skipped):
+            await tool_end(message)
+            results.append(message)
         print('Back to the model!')
         return {'messages': results}
 
@@ -79,16 +220,35 @@ def create_graph():
     agent = TravelAgent()
     
     builder = StateGraph(AgentState)
-    builder.add_node('call_tools_llm', agent.call_tools_llm)
-    builder.add_node('invoke_tools', agent.invoke_tools)
-    builder.set_entry_point('call_tools_llm')
-
-    builder.add_conditional_edges('call_tools_llm', TravelAgent.exists_action, {'invoke_tools': 'invoke_tools', END: END})
-    builder.add_edge('invoke_tools', 'call_tools_llm')
+    # Each node has a sync and an async body: `invoke` keeps working, `ainvoke`/`astream` never block the loop.
+    builder.add_node('prefetch', RunnableLambda(agent.prefetch, afunc=agent.aprefetch))
+    builder.add_node('call_tools_llm', RunnableLambda(agent.call_tools_llm, afunc=agent.acall_tools_llm))
+    builder.add_node('invoke_tools', RunnableLambda(agent.invoke_tools, afunc=agent.ainvoke_tools))
+    builder.add_node('synthesize', RunnableLambda(agent.synthesize, afunc=agent.asynthesize))
+    builder.add_node('render', RunnableLambda(agent.render, afunc=agent.arender))
+    builder.set_entry_point('prefetch')
+    builder.add_edge('prefetch', 'call_tools_llm')
+
+    builder.add_conditional_edges('call_tools_llm', TravelAgent.exists_action,
+                                  {'invoke_tools': 'invoke_tools', 'synthesize': 'synthesize', END: END})
+    builder.add_conditional_edges('invoke_tools', TravelAgent.after_tools,
+                                  {'call_tools_llm': 'call_tools_llm', 'render': 'render'})
+    builder.add_edge('synthesize', END)
+    builder.add_edge('render', END)
     
-    memory = MemorySaver()
+    memory = create_checkpointer()
     return builder.compile(checkpointer=memory)
 
 
-# This is the graph that LangGraph CLI will use
-graph = create_graph()
+_graph = None
+
+
+def __getattr__(name: str):
+    # `graph` is what LangGraph CLI loads (see langgraph.json). Building it on first access
+    # keeps `from agents.graph import create_graph` cheap for the servers.
+    global _graph
+    if name == 'graph':
+        if _graph is None:
+            _graph = create_graph()
+        return _graph
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,270 @@
+import datetime
+import json
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Optional
+
+from agents import metrics
+from agents.tools.cache import TTLCache
+
+if TYPE_CHECKING:  # tools_succeeded and cached_answer import the message classes when first called
+    from langchain_core.messages import AnyMessage, ToolMessage
+
+ANSWER_CACHE_SIZE = int(os.environ.get('ANSWER_CACHE_SIZE', '512'))
+
+# (days until departure, TTL seconds): fares for imminent trips move fastest.
+LEAD_TIME_TTLS = [(7, 300), (30, 900), (None, 3600)]
+
+MONTHS = {name: i + 1 for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])}
+_MONTH = r'(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?'
+_RANGE_SEP = r'\s*(?:-|–|—|to|until|till)\s*'
+
+# Three-letter capitals that are words, not airports.
+_NOT_AIRPORTS = {'AND', 'THE', 'FOR', 'USD', 'EUR', 'GBP', 'ANY', 'ALL', 'NOT', 'BUT', 'YOU', 'ARE', 'CAN', 'PLS'}
+
+_IATA = re.compile(r'(?<![A-Za-z])([A-Z]{3})(?![A-Za-z])')
+_FROM = re.compile(r'(?i:\bfrom)\s+([A-Z]{3})(?![A-Za-z])')
+_TO = re.compile(r'(?i:\bto)\s+([A-Z]{3})(?![A-Za-z])')
+_ROUTE = re.compile(r'(?<![A-Za-z])([A-Z]{3})\s*(?:(?i:to)|→|->|-|–|—|/)\s*([A-Z]{3})(?![A-Za-z])')
+_ISO_DATE = re.compile(r'\b(\d{4}-\d{2}-\d{2})\b')
+_MONTH_DAY_RANGE = re.compile(rf'\b{_MONTH}\s*(\d{{1,2}})(?:st|nd|rd|th)?(?:{_RANGE_SEP}(?:{_MONTH}\s*)?(\d{{1,2}}))?\b', re.I)
+_DAY_RANGE_MONTH = re.compile(rf'\b(\d{{1,2}})(?:st|nd|rd|th)?(?:{_RANGE_SEP}(\d{{1,2}})(?:st|nd|rd|th)?)?\s+(?:of\s+)?{_MONTH}', re.I)
+_ADULTS = re.compile(r'\b(\d+)\s*(?:adults?|people|persons|travell?ers|passengers|guests|pax)\b', re.I)
+_CHILDREN = re.compile(r'\b(\d+)\s*(?:child|children|kids?)\b', re.I)
+_HOTEL_CLASS = re.compile(r'\b([1-5])[\s-]*(?:star|\*)', re.I)
+_WANTS_HOTELS = re.compile(r'hotel|stay|accommodation|room', re.I)
+_WANTS_FLIGHTS = re.compile(r'flight|fly|airfare|ticket|→|->', re.I)
+_WORD = re.compile(r'[a-z]+|\d+|[$€£%<>+]', re.I)
+
+# Words that carry no constraint. Any other word left after the slots are taken out
+# (cabin class, nonstop, infants, price caps, room counts, airlines...) is a qualifier
+# the slots cannot express, and the query is not cached.
+_FILLER = set('''
+    a an the i m we me us my our please pls hi hello thanks
+    find search show get book look looking check give list need want would like could can you
+    for from to and with on in at of by between around about
+    flight flights fly flying airfare airfares fare fares ticket tickets trip travel travelling traveling
+    round roundtrip return returning back economy
+    hotel hotels stay staying accommodation accommodations room
+    adult adults people person persons traveler travelers traveller travellers passenger passengers guest guests pax
+    child children kid kids star stars
+'''.split())
+
+
+@dataclass(frozen=True)
+class TravelSlots:
+    origin: str
+    destination: str
+    outbound_date: str
+    return_date: Optional[str]
+    adults: int
+    children: int
+    hotel_class: Optional[int]
+    flights: bool
+    hotels: bool
+
+    def key(self, today: datetime.date) -> str:
+        # The date bucket rolls cached answers over daily even when their TTL is long.
+        return json.dumps({**asdict(self), 'asked_on': today.isoformat()}, sort_keys=True)
+
+    def ttl(self, today: datetime.date) -> float:
+        lead_days = (datetime.date.fromisoformat(self.outbound_date) - today).days
+        for limit, ttl in LEAD_TIME_TTLS:
+            if limit is None or lead_days <= limit:
+                return ttl
+        return LEAD_TIME_TTLS[-1][1]
+
+
+def _date(month: str, day: str, today: datetime.date) -> Optional[datetime.date]:
+    try:
+        date = datetime.date(today.year, MONTHS[month[:3].lower()], int(day))
+    except ValueError:
+        return None
+    # "Oct 1" asked in November means next October.
+    return date if date >= today else date.replace(year=today.year + 1)
+
+
+def _dates(query: str, today: datetime.date) -> tuple[Optional[str], Optional[str]]:
+    iso = _ISO_DATE.findall(query)
+    if iso:
+        return iso[0], iso[1] if len(iso) > 1 else None
+    match = _MONTH_DAY_RANGE.search(query)
+    if match:
+        month, first, end_month, last = match.groups()
+        outbound = _date(month, first, today)
+        back = _date(end_month or month, last, today) if last else None
+    else:
+        match = _DAY_RANGE_MONTH.search(query)
+        if not match:
+            return None, None
+        first, last, month = match.groups()
+        outbound = _date(month, first, today)
+        back = _date(month, last, today) if last else None
+    if outbound is None:
+        return None, None
+    if back is not None and back < outbound:
+        back = back.replace(year=back.year + 1)
+    return outbound.isoformat(), back.isoformat() if back else None
+
+
+def _route(query: str, airports: list[str]) -> Optional[tuple[str, str]]:
+    '''(origin, destination) from explicit markers: "from X", "to Y", "X to Y", "X → Y".'''
+    origins, destinations = set(_FROM.findall(query)), set(_TO.findall(query))
+    if len(origins) > 1 or len(destinations) > 1:
+        return None
+    origin = origins.pop() if origins else None
+    destination = destinations.pop() if destinations else None
+    route = _ROUTE.search(query)
+    if route is not None:
+        if origin not in (None, route.group(1)) or destination not in (None, route.group(2)):
+            return None
+        origin, destination = route.groups()
+    elif origin is None and destination is None:
+        return None
+    elif origin is None:
+        origin = next(code for code in airports if code != destination)
+    elif destination is None:
+        destination = next(code for code in airports if code != origin)
+    if {origin, destination} != set(airports):
+        return None
+    return origin, destination
+
+
+def _understood(query: str) -> bool:
+    '''True if every word of `query` is either part of a slot or filler.'''
+    # Take out exactly the date text `_dates` reads; a further date ("returning Oct 9") must stay and fail.
+    if _ISO_DATE.search(query):
+        query = _ISO_DATE.sub(' ', query, count=2)
+    elif _MONTH_DAY_RANGE.search(query):
+        query = _MONTH_DAY_RANGE.sub(' ', query, count=1)
+    else:
+        query = _DAY_RANGE_MONTH.sub(' ', query, count=1)
+    for pattern in (_ADULTS, _CHILDREN, _HOTEL_CLASS, _IATA):
+        query = pattern.sub(' ', query)
+    return all(word.lower() in _FILLER for word in _WORD.findall(query))
+
+
+def extract_slots(query: str, today: Optional[datetime.date] = None) -> Optional[TravelSlots]:
+    '''
+    Pull normalized travel slots out of a free-text request.
+
+    Only unambiguous requests are recognized: exactly two IATA codes with an
+    explicit direction ("from MAD to AMS", "MAD → AMS", "to AMS from MAD"),
+    at least an outbound date, and no words beyond the slots and filler, so
+    "business class", "nonstop", "under $500" or "2 rooms" are not cached.
+    Anything else returns None and is never cached, so a wrong guess costs
+    a cache miss rather than a wrong answer.
+    '''
+    today = today or datetime.date.today()
+    airports = list(dict.fromkeys(code for code in _IATA.findall(query) if code not in _NOT_AIRPORTS))
+    if len(airports) != 2:
+        return None
+    route = _route(query, airports)
+    if route is None or not _understood(query):
+        return None
+    outbound, back = _dates(query, today)
+    if outbound is None:
+        return None
+    adults = _ADULTS.search(query)
+    children = _CHILDREN.search(query)
+    hotel_class = _HOTEL_CLASS.search(query)
+    hotels = bool(_WANTS_HOTELS.search(query))
+    return TravelSlots(
+        origin=route[0],
+        destination=route[1],
+        outbound_date=outbound,
+        return_date=back,
+        adults=int(adults.group(1)) if adults else 1,
+        children=int(children.group(1)) if children else 0,
+        hotel_class=int(hotel_class.group(1)) if hotel_class else None,
+        flights=bool(_WANTS_FLIGHTS.search(query)) or not hotels,
+        hotels=hotels,
+    )
+
+
+def _tool_succeeded(message: 'ToolMessage') -> bool:
+    # Timeouts, skips and executor errors are flagged by the tool executor; tools themselves
+    # report failures (circuit open, upstream errors) as plain text instead of a JSON result.
+    if message.response_metadata.get('status', 'ok') != 'ok':
+        return False
+    try:
+        result = json.loads(message.content)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(result, list) or (isinstance(result, dict) and not result.get('failed'))
+
+
+def tools_succeeded(messages: 'list[AnyMessage]') -> bool:
+    '''True if every tool call since the last user message returned a result.'''
+    from langchain_core.messages import HumanMessage, ToolMessage
+
+    start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+    return all(_tool_succeeded(m) for m in messages[start + 1:] if isinstance(m, ToolMessage))
+
+
+class AnswerCache:
+    '''Final answers of first-turn queries, keyed by their travel slots.'''
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE):
+        self._cache = TTLCache(maxsize)
+        self._lock = threading.Lock()
+        self.uncacheable = 0
+        self.partial = 0
+        self.stored = 0
+
+    def get(self, query: str) -> Optional[str]:
+        today = datetime.date.today()
+        slots = extract_slots(query, today)
+        if slots is None:
+            with self._lock:
+                self.uncacheable += 1
+            return None
+        _, answer = self._cache.get(slots.key(today))
+        return answer
+
+    def put(self, query: str, answer: str, messages: 'list[AnyMessage]' = ()):
+        '''Cache `answer` unless a tool call of the turn in `messages` failed: an outage reply must not stick.'''
+        today = datetime.date.today()
+        slots = extract_slots(query, today)
+        if slots is None or not answer:
+            return
+        if not tools_succeeded(messages):
+            with self._lock:
+                self.partial += 1
+            return
+        self._cache.set(slots.key(today), answer, ttl=slots.ttl(today))
+        with self._lock:
+            self.stored += 1
+
+    def stats(self) -> dict:
+        report = self._cache.stats()
+        with self._lock:
+            report.update({'uncacheable': self.uncacheable, 'partial': self.partial, 'stored': self.stored})
+        return report
+
+
+answer_cache = AnswerCache()
+
+metrics.register('answer_cache', answer_cache.stats)
+
+
+async def cached_answer(graph, query: str, thread_id: str) -> Optional[str]:
+    '''
+    Serve a first-turn query from the answer cache without running the LLM loop.
+
+    On a hit the question and cached answer are written to the thread, so a
+    follow-up on the same thread_id still has the conversation.
+    '''
+    answer = answer_cache.get(query)
+    if answer is None:
+        return None
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    # Only first turns are cached, so the thread is new and the checkpointer need not look it up.
+    config = {'configurable': {'thread_id': thread_id, 'new_thread': True}}
+    await graph.aupdate_state(config, {'messages': [HumanMessage(content=query), AIMessage(content=answer)]},
+                              as_node='call_tools_llm')
+    return answer
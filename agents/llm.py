@@ -0,0 +1,100 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from agents import metrics
+
+PLANNER_MODEL = os.environ.get('PLANNER_MODEL', 'gemini-2.0-flash')
+# Empty: the planner's own reply is the answer and no synthesis call is made.
+SYNTHESIS_MODEL = os.environ.get('SYNTHESIS_MODEL', '')
+LLM_TEMPERATURE = float(os.environ.get('LLM_TEMPERATURE', '0.1'))
+
+
+@dataclass(frozen=True)
+class ModelRouting:
+    '''
+    Which model runs which node.
+
+    The planner decides tool calls; once the tools are done, the synthesis
+    model writes the user-facing answer. Set per run via `configurable`,
+    e.g. `{'planner_model': 'gemini-2.0-flash-lite', 'synthesis_model': 'gemini-2.0-pro'}`,
+    or process-wide through PLANNER_MODEL and SYNTHESIS_MODEL.
+    '''
+    planner_model: str = PLANNER_MODEL
+    synthesis_model: str = SYNTHESIS_MODEL
+
+    @classmethod
+    def from_config(cls, config: Optional[RunnableConfig]) -> 'ModelRouting':
+        configurable = (config or {}).get('configurable', {})
+        defaults = cls()
+        return cls(
+            planner_model=configurable.get('planner_model', defaults.planner_model),
+            synthesis_model=configurable.get('synthesis_model', defaults.synthesis_model),
+        )
+
+    @property
+    def synthesis(self) -> bool:
+        return bool(self.synthesis_model)
+
+    @property
+    def answer_model(self) -> str:
+        return self.synthesis_model or self.planner_model
+
+
+_models: dict[str, BaseChatModel] = {}
+_models_lock = threading.Lock()
+
+
+def chat_model(name: str) -> BaseChatModel:
+    '''
+    Process-wide chat model by name, so every run shares its HTTP clients.
+
+    `fake` (or `fake:path/to/script.json`) selects the offline ScriptedChatModel,
+    e.g. `configurable={'planner_model': 'fake'}` for load tests without a Google key.
+    '''
+    with _models_lock:
+        if name not in _models:
+            if name == 'fake' or name.startswith('fake:'):
+                from agents.fake_llm import ScriptedChatModel
+                _models[name] = ScriptedChatModel.from_env(name.partition(':')[2] or None)
+            else:
+                _models[name] = ChatGoogleGenerativeAI(model=name, temperature=LLM_TEMPERATURE)
+        return _models[name]
+
+
+class NodeStats:
+    '''Latency and token usage of LLM calls per graph node and model, to tune the model split.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: dict[str, dict] = {}
+
+    def record(self, node: str, model: str, seconds: float, message: AIMessage):
+        usage = getattr(message, 'usage_metadata', None) or {}
+        with self._lock:
+            stats = self._nodes.setdefault(f'{node}:{model}', {
+                'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'input_tokens': 0, 'output_tokens': 0})
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['input_tokens'] += usage.get('input_tokens', 0)
+            stats['output_tokens'] += usage.get('output_tokens', 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {**s, 'seconds': round(s['seconds'], 3), 'max_seconds': round(s['max_seconds'], 3),
+                       'avg_seconds': round(s['seconds'] / s['calls'], 3)}
+                for name, s in self._nodes.items()
+            }
+
+
+node_stats = NodeStats()
+
+metrics.register('llm_nodes', node_stats.stats)
@@ -0,0 +1,18 @@
+import threading
+from typing import Callable
+
+_providers: dict[str, Callable[[], dict]] = {}
+_lock = threading.Lock()
+
+
+def register(name: str, provider: Callable[[], dict]):
+    '''Register a zero-argument callable whose dict is reported under `name`.'''
+    with _lock:
+        _providers[name] = provider
+
+
+def snapshot() -> dict:
+    '''Collect the current counters of every registered component.'''
+    with _lock:
+        providers = dict(_providers)
+    return {name: provider() for name, provider in providers.items()}
@@ -0,0 +1,104 @@
+# pylint: disable = print-used
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from langchain_core.messages import AnyMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+from agents.intent_cache import extract_slots
+from agents.tools.cache import cache_key
+from agents.tools.flights_finder import FlightsInput, search_params
+from agents.tools.search import asearch, search, speculation
+
+SEARCH_PREFETCH = os.environ.get('SEARCH_PREFETCH', '0') == '1'
+PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', '2'))
+
+
+def prefetch_enabled(config: Optional[RunnableConfig]) -> bool:
+    '''Per run via `configurable={'prefetch': True}`, process-wide through SEARCH_PREFETCH=1.'''
+    return bool((config or {}).get('configurable', {}).get('prefetch', SEARCH_PREFETCH))
+
+
+def speculative_searches(messages: list[AnyMessage]) -> list[dict]:
+    '''
+    SerpAPI params of the searches the model is likely to request for the latest user message.
+
+    Only a flight search is guessed: two IATA codes and a date map one to one
+    onto `flights_finder` arguments, and the cache key normalizes the rest.
+    Hotel searches take a free-text location the model picks, so guessing
+    it would mostly be wasted quota.
+    '''
+    query = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), None)
+    slots = extract_slots(query) if isinstance(query, str) else None
+    if slots is None or not slots.flights:
+        return []
+    return [search_params(FlightsInput(
+        departure_airport=slots.origin,
+        arrival_airport=slots.destination,
+        outbound_date=slots.outbound_date,
+        return_date=slots.return_date,
+        adults=slots.adults,
+        children=slots.children,
+    ))]
+
+
+class Prefetcher:
+    '''
+    Start likely searches in the background while the LLM is still planning.
+
+    Results land in the shared result cache; a matching tool call that
+    arrives while a search is still running joins it through the search
+    singleflight. Hits and waste are tracked by `search.speculation`.
+    '''
+
+    def __init__(self, workers: int = PREFETCH_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self._tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _started(params: dict) -> Optional[str]:
+        key = cache_key(params)
+        return key if speculation.start(key) else None
+
+    @staticmethod
+    def _run(key: str, params: dict):
+        try:
+            search(params, speculative=True)
+        except Exception as e:
+            print(f'Prefetch failed: {e}')
+            speculation.failed(key)
+
+    @staticmethod
+    async def _arun(key: str, params: dict):
+        try:
+            await asearch(params, speculative=True)
+        except Exception as e:
+            print(f'Prefetch failed: {e}')
+            speculation.failed(key)
+
+    def start(self, messages: list[AnyMessage]) -> int:
+        started = 0
+        for params in speculative_searches(messages):
+            key = self._started(params)
+            if key is not None:
+                self._executor.submit(self._run, key, params)
+                started += 1
+        return started
+
+    def astart(self, messages: list[AnyMessage]) -> int:
+        started = 0
+        for params in speculative_searches(messages):
+            key = self._started(params)
+            if key is not None:
+                task = asyncio.create_task(self._arun(key, params))
+                # The loop only keeps weak references to tasks.
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                started += 1
+        return started
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,152 @@
+import json
+import os
+from typing import Optional
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+from agents.intent_cache import extract_slots
+
+RENDER_RESULTS = os.environ.get('RENDER_RESULTS', '0') == '1'
+CURRENCY = 'USD'
+
+
+def render_enabled(config: Optional[RunnableConfig]) -> bool:
+    '''Per run via `configurable={'render': True}`, process-wide through RENDER_RESULTS=1.'''
+    return bool((config or {}).get('configurable', {}).get('render', RENDER_RESULTS))
+
+
+def _price(value) -> str:
+    return f'${value:,} {CURRENCY}' if isinstance(value, (int, float)) else str(value)
+
+
+def _duration(minutes) -> Optional[str]:
+    if not isinstance(minutes, int):
+        return None
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h {minutes:02d}m' if hours else f'{minutes}m'
+
+
+def _joined(*parts) -> str:
+    return ' · '.join(str(part) for part in parts if part)
+
+
+def render_flights(result: dict) -> list[str]:
+    flights = result.get('flights', [])
+    if not flights:
+        return ['## ✈️ Flights', '', 'No flights were found for these dates.', '']
+    first = flights[0]
+    route = ' → '.join(part.split(' ')[0] for part in (first.get('depart'), first.get('arrive')) if part)
+    lines = [f'## ✈️ Flights {route}'.rstrip(), '']
+    for i, flight in enumerate(flights, 1):
+        lines.append(f"{i}. **{flight.get('airline', 'Flight')}** — "
+                     + _joined(_price(flight.get('price')), flight.get('type'), _duration(flight.get('duration')),
+                               flight.get('class')))
+        if flight.get('logo'):
+            lines.append(f"   ![{flight.get('airline', 'airline')}]({flight['logo']})")
+        lines.append(f"   Depart: {flight.get('depart', '?')} → Arrive: {flight.get('arrive', '?')}")
+        details = _joined(', '.join(flight.get('flights', [])),
+                          f"Stops: {', '.join(flight['stops'])}" if flight.get('stops') else 'Nonstop')
+        lines.append(f'   {details}')
+    if result.get('link'):
+        lines += ['', f"[Book on Google Flights]({result['link']})"]
+    return lines + ['']
+
+
+def render_hotels(hotels: list) -> list[str]:
+    if not hotels:
+        return ['## 🏨 Hotels', '', 'No hotels were found for these dates.', '']
+    lines = ['## 🏨 Hotels', '']
+    for i, hotel in enumerate(hotels, 1):
+        name = hotel.get('name', 'Hotel')
+        title = f"[{name}]({hotel['link']})" if hotel.get('link') else name
+        rating = None
+        if hotel.get('rating'):
+            reviews = f" ({hotel['reviews']:,} reviews)" if isinstance(hotel.get('reviews'), int) else ''
+            rating = f"⭐ {hotel['rating']}{reviews}"
+        summary = _joined(hotel.get('class'), rating)
+        lines.append(f'{i}. **{title}**' + (f' — {summary}' if summary else ''))
+        if hotel.get('logo'):
+            lines.append(f'   ![{name}]({hotel["logo"]})')
+        if hotel.get('rate_per_night'):
+            lines.append(f"   Rate: {hotel['rate_per_night']} per night")
+        if hotel.get('total'):
+            lines.append(f"   Total: {hotel['total']}")
+        if hotel.get('amenities'):
+            lines.append(f"   Amenities: {', '.join(hotel['amenities'])}")
+    return lines + ['']
+
+
+def render_fare_matrix(result: dict) -> list[str]:
+    lines = [f"## 📅 Cheapest dates {result.get('route', '').replace('-', ' → ')}".rstrip(), '']
+    cheapest = result.get('cheapest', [])
+    if not cheapest:
+        lines.append('No fares were found in this date range.')
+    for i, cell in enumerate(cheapest, 1):
+        dates = f"{cell['outbound']} → {cell['return']}" if cell.get('return') else cell['outbound']
+        lines.append(f"{i}. {dates}: **{_price(cell['price'])}**")
+    lines += ['', f"Searched {result.get('searched', 0)} date pairs"
+              + (f", {result['skipped']} skipped" if result.get('skipped') else '')
+              + (f", {result['failed']} without fares" if result.get('failed') else '') + '.']
+    return lines + ['']
+
+
+# Tools that answer each intent of TravelSlots.
+INTENT_TOOLS = {
+    'flights': {'flights_finder', 'fare_matrix'},
+    'hotels': {'hotels_finder'},
+}
+
+RENDERERS = {
+    'flights_finder': (dict, render_flights),
+    'hotels_finder': (list, render_hotels),
+    'fare_matrix': (dict, render_fare_matrix),
+}
+
+
+def plan_complete(messages: list[AnyMessage]) -> bool:
+    '''
+    True once the tool calls of this turn cover every intent of the request and all have answers.
+
+    The intents (flights, hotels) come from `extract_slots`. A request it
+    cannot read, e.g. one with qualifiers, never counts as complete, and
+    neither does a turn with an unanswered call: the LLM decides what comes
+    next, such as the hotel search after the flights of a two-step plan.
+    '''
+    start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+    if start < 0 or not isinstance(messages[start].content, str):
+        return False
+    slots = extract_slots(messages[start].content)
+    if slots is None:
+        return False
+    turn = messages[start + 1:]
+    calls = [call for m in turn if isinstance(m, AIMessage) for call in m.tool_calls]
+    answered = {m.tool_call_id for m in turn if isinstance(m, ToolMessage)}
+    if not calls or any(call['id'] not in answered for call in calls):
+        return False
+    called = {call['name'] for call in calls}
+    return all(called & tools for intent, tools in INTENT_TOOLS.items() if getattr(slots, intent))
+
+
+def render_turn(messages: list[AnyMessage]) -> Optional[list[str]]:
+    '''
+    Markdown lines for the tool results of the current turn, in the layout TOOLS_SYSTEM_PROMPT asks for.
+
+    Returns None unless every result is a well-formed projection of a known
+    tool; errors, timeouts and skipped calls are left to the LLM to explain.
+    '''
+    start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+    results = [m for m in messages[start + 1:] if isinstance(m, ToolMessage)]
+    if not results:
+        return None
+    lines = []
+    for message in results:
+        kind, renderer = RENDERERS.get(message.name, (None, None))
+        try:
+            result = json.loads(message.content)
+        except (TypeError, ValueError):
+            return None
+        if renderer is None or not isinstance(result, kind):
+            return None
+        lines += renderer(result)
+    return lines
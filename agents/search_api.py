@@ -0,0 +1,66 @@
+import logging
+import time
+
+import httpx
+from fastapi import APIRouter, Body, HTTPException
+
+from agents.tools.resilience import CircuitOpenError
+from agents.tools.serpapi_client import SerpApiError
+
+# Structured searches for callers that already know airports and dates: no LLM round trips,
+# same SerpAPI client, result cache, singleflight and circuit breaker as the agent's tools.
+# The tools and their LangChain schemas are imported per request, so servers can mount this before the port opens.
+router = APIRouter(prefix='/travel/search', tags=['search'])
+logger = logging.getLogger(__name__)
+
+FLIGHTS_REQUIRED = ('departure_airport', 'arrival_airport', 'outbound_date')
+
+
+def _validate(model, body: dict, required: tuple = ()):
+    # The tool schemas are pydantic v1 models, which FastAPI cannot use as a request body directly.
+    from langchain.pydantic_v1 import ValidationError
+
+    try:
+        params = model.parse_obj(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors()) from e
+    missing = [name for name in required if getattr(params, name) is None]
+    if missing:
+        raise HTTPException(status_code=422, detail=[{'loc': [name], 'msg': 'field required'} for name in missing])
+    return params
+
+
+async def _search(find, params) -> dict:
+    start = time.perf_counter()
+    try:
+        results = await find(params)
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '30'}) from e
+    except (TimeoutError, httpx.TimeoutException) as e:
+        logger.warning('Structured search timed out: %s', e)
+        raise HTTPException(status_code=504, detail=str(e) or 'Upstream search timed out') from e
+    except Exception as e:
+        logger.warning('Structured search failed: %s', e, exc_info=not isinstance(e, SerpApiError))
+        status = 429 if isinstance(e, SerpApiError) and e.status_code == 429 else 502
+        raise HTTPException(status_code=status, detail=str(e) or type(e).__name__) from e
+    return {'results': results, 'processing_time': round(time.perf_counter() - start, 3)}
+
+
+@router.post('/flights')
+async def search_flights(body: dict = Body(..., examples=[{
+        'departure_airport': 'MAD', 'arrival_airport': 'AMS',
+        'outbound_date': '2025-10-01', 'return_date': '2025-10-07', 'adults': 2}])):
+    '''Best flights for known airports and dates, validated against `FlightsInput`'''
+    from agents.tools.flights_finder import FlightsInput, afind_flights
+
+    return await _search(afind_flights, _validate(FlightsInput, body, FLIGHTS_REQUIRED))
+
+
+@router.post('/hotels')
+async def search_hotels(body: dict = Body(..., examples=[{
+        'q': 'Amsterdam', 'check_in_date': '2025-10-01', 'check_out_date': '2025-10-07',
+        'adults': 2, 'hotel_class': '4'}])):
+    '''Top hotels for a known location and stay, validated against `HotelsInput`'''
+    from agents.tools.hotels_finder import HotelsInput, afind_hotels
+
+    return await _search(afind_hotels, _validate(HotelsInput, body))
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import aclosing
+from typing import AsyncGenerator, Awaitable, Callable, Optional
+
+from agents import metrics
+from agents.budget import budget_report, run_config
+
+SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', '15'))
+# Seconds between client disconnect checks while the agent is busy.
+SSE_DISCONNECT_POLL = float(os.environ.get('SSE_DISCONNECT_POLL', '1'))
+
+# Only tokens from the agent's LLM nodes are user-facing; tool and router runs are not.
+ANSWER_NODES = {'call_tools_llm', 'synthesize'}
+# Tags planner replies that a synthesis model is about to rewrite.
+DRAFT_TAG = 'answer_draft'
+# Custom event carrying one line of a locally rendered answer (see agents.render).
+RENDER_EVENT = 'answer_line'
+# Custom events around each tool call of the tools node.
+TOOL_START_EVENT = 'tool_start'
+TOOL_END_EVENT = 'tool_end'
+
+# Event types of the `text/event-stream` protocol of the streaming endpoints.
+RUN_START = 'run_start'
+TOKEN = 'token'
+FINAL = 'final'
+ERROR = 'error'
+DONE = 'done'
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    # Keeps nginx-style proxies from buffering the stream.
+    'X-Accel-Buffering': 'no',
+}
+
+
+def message_text(content) -> str:
+    '''Text of a message or chunk, whether Gemini returned a string or a list of parts.'''
+    if isinstance(content, str):
+        return content
+    return ''.join(part if isinstance(part, str) else part.get('text', '') for part in content)
+
+
+def sse_event(event: str, data: dict, event_id: int) -> str:
+    '''Frame one typed SSE event; the JSON payload never contains a raw newline.'''
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+class StreamStats:
+    '''How SSE streams ended; abandoned streams lost their client before `done`.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'started': 0, 'completed': 0, 'failed': 0, 'abandoned': 0}
+        self._abandoned_seconds = 0.0
+
+    def record(self, outcome: str, seconds: float = 0.0):
+        with self._lock:
+            self._counts[outcome] += 1
+            if outcome == 'abandoned':
+                self._abandoned_seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+            abandoned_seconds = self._abandoned_seconds
+        ended = counts['completed'] + counts['failed'] + counts['abandoned']
+        return {
+            **counts,
+            'active': counts['started'] - ended,
+            'avg_abandoned_after': round(abandoned_seconds / counts['abandoned'], 3) if counts['abandoned'] else None,
+        }
+
+
+stream_stats = StreamStats()
+
+metrics.register('streams', stream_stats.stats)
+
+
+async def _cancel(task: asyncio.Future):
+    if not task.done():
+        task.cancel()
+        await asyncio.wait({task})
+
+
+async def sse_stream(events: AsyncGenerator[tuple[str, dict], None], heartbeat: float = SSE_HEARTBEAT,
+                     is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None) -> AsyncGenerator[str, None]:
+    '''
+    Serialize `(event, data)` pairs as a `text/event-stream` body.
+
+    Every event gets an increasing id and `t`, the seconds since the stream
+    started, so per-phase latency can be read off the wire. A comment line
+    goes out whenever nothing was sent for `heartbeat` seconds, to keep
+    proxies and load balancers from closing an idle connection while the
+    agent is still searching. An exception becomes an `error` event, and the
+    stream always ends with `done`.
+
+    When the client goes away, whether seen by polling `is_disconnected`
+    (e.g. `request.is_disconnected`) or because the server cancels or closes
+    this generator, `events` is closed. For an agent run that cancels the
+    graph task with its in-flight LLM request and tool calls.
+    '''
+    start = time.perf_counter()
+    last_sent = last_checked = start
+    poll = min(heartbeat, SSE_DISCONNECT_POLL) if is_disconnected is not None else heartbeat
+    event_id = 0
+    outcome = 'abandoned'
+
+    def frame(event: str, data: dict) -> str:
+        nonlocal event_id, last_sent
+        event_id += 1
+        last_sent = time.perf_counter()
+        return sse_event(event, {**data, 't': round(last_sent - start, 3)}, event_id)
+
+    stream_stats.record('started')
+    try:
+        ended = 'completed'
+        try:
+            while True:
+                pending = asyncio.ensure_future(events.__anext__())
+                try:
+                    while True:
+                        done = (await asyncio.wait({pending}, timeout=poll))[0]
+                        # Checked on a timer, not per event: a fast token stream must not poll per token.
+                        if is_disconnected is not None and time.perf_counter() - last_checked >= poll:
+                            last_checked = time.perf_counter()
+                            if await is_disconnected():
+                                return
+                        if done:
+                            break
+                        if time.perf_counter() - last_sent >= heartbeat:
+                            last_sent = time.perf_counter()
+                            yield ': heartbeat\n\n'
+                finally:
+                    await _cancel(pending)
+                try:
+                    event, data = pending.result()
+                except StopAsyncIteration:
+                    break
+                yield frame(event, data)
+        except Exception as e:
+            ended = 'failed'
+            yield frame(ERROR, {'message': str(e)})
+        yield frame(DONE, {})
+        outcome = ended
+    finally:
+        await events.aclose()
+        stream_stats.record(outcome, time.perf_counter() - start)
+
+
+async def close_open_tool_calls(graph, config: dict) -> int:
+    '''
+    Answer the tool calls a cancelled run left without results; returns how many.
+
+    A run cancelled while its tools were running is checkpointed right after
+    the LLM asked for them. Left like that, the next turn on the thread would
+    send the model a function call without a response, which Gemini rejects.
+    '''
+    from langchain_core.messages import AIMessage
+
+    from agents.tool_executor import cancelled_tool_calls
+
+    state = await graph.aget_state(config)
+    messages = state.values.get('messages', [])
+    if not messages or not isinstance(messages[-1], AIMessage) or not messages[-1].tool_calls:
+        return 0
+    results = cancelled_tool_calls(messages[-1].tool_calls)
+    await graph.aupdate_state(config, {'messages': results}, as_node='invoke_tools')
+    return len(results)
+
+
+def _tool_event(data: dict) -> dict:
+    return {key: data[key] for key in ('id', 'name', 'args', 'seconds', 'status') if key in data}
+
+
+async def stream_agent_events(graph, query: str, thread_id: str, config: Optional[dict] = None,
+                              new_thread: bool = False) -> AsyncGenerator[tuple[str, dict], None]:
+    '''
+    Yield `(event, data)` pairs for one agent run while the graph is still running.
+
+    Runs the graph through `astream_events`, which makes the chat model hit its
+    streaming API. Text chunks from the LLM nodes become `token` events;
+    tool-call turns produce no text, so only the answer reaches the client.
+    Locally rendered answers arrive line by line, also as `token` events. The
+    tools node reports `tool_start` and `tool_end` (with the call's seconds and
+    status). `final` carries the complete answer and any budget exhaustion.
+    '''
+    from langchain_core.messages import HumanMessage
+
+    config = config or run_config(thread_id, new_thread=new_thread)
+    yield RUN_START, {'thread_id': thread_id}
+    try:
+        # Closing this generator early closes astream_events, which cancels the graph run.
+        async with aclosing(graph.astream_events({'messages': [HumanMessage(content=query)]}, config=config,
+                                                 version='v2')) as events:
+            async for event in events:
+                if event['event'] == 'on_custom_event':
+                    if event['name'] == RENDER_EVENT:
+                        yield TOKEN, {'text': event['data']['text']}
+                    elif event['name'] in (TOOL_START_EVENT, TOOL_END_EVENT):
+                        yield event['name'], _tool_event(event['data'])
+                    continue
+                if event['event'] != 'on_chat_model_stream':
+                    continue
+                metadata = event.get('metadata', {})
+                if metadata.get('langgraph_node') not in ANSWER_NODES or DRAFT_TAG in event.get('tags', []):
+                    continue
+                text = message_text(event['data']['chunk'].content)
+                if text:
+                    yield TOKEN, {'text': text}
+    except (asyncio.CancelledError, GeneratorExit):
+        try:
+            # The run is stopped by now; shielded so a second cancel cannot leave the thread half repaired.
+            await asyncio.shield(close_open_tool_calls(graph, config))
+        except Exception as e:
+            print(f'Could not answer the open tool calls of cancelled thread {thread_id}: {e}')
+        raise
+    state = await graph.aget_state(config)
+    messages = state.values.get('messages', [])
+    final = {'text': message_text(messages[-1].content) if messages else ''}
+    budget = budget_report(messages[-1]) if messages else None
+    if budget:
+        final['budget'] = budget
+    yield FINAL, final
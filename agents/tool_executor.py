@@ -0,0 +1,119 @@
+# pylint: disable = print-used
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Awaitable, Callable, Optional
+
+from langchain_core.messages import ToolMessage
+
+from agents.tools.projection import compact_dumps
+
+TOOL_CALL_TIMEOUT = float(os.environ.get('TOOL_CALL_TIMEOUT', '60'))
+MAX_TOOL_WORKERS = int(os.environ.get('MAX_TOOL_WORKERS', '8'))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix='tool-call')
+
+
+def _invoke(tools: dict, tool_call: dict):
+    print(f'Calling: {tool_call}')
+    if not tool_call['name'] in tools:  # check for bad tool name from LLM
+        print('\n ....bad tool name....')
+        return 'bad tool name, retry'  # instruct LLM to retry if bad
+    return tools[tool_call['name']].invoke(tool_call['args'])
+
+
+def _timed_invoke(tools: dict, tool_call: dict):
+    start = time.perf_counter()
+    return _invoke(tools, tool_call), time.perf_counter() - start
+
+
+async def _ainvoke(tools: dict, tool_call: dict):
+    tool = tools.get(tool_call['name'])
+    if tool is None or getattr(tool, 'coroutine', None) is None:
+        # Sync-only tools go to the bounded pool, never the event loop's default executor.
+        return await asyncio.get_running_loop().run_in_executor(_executor, _invoke, tools, tool_call)
+    print(f'Calling: {tool_call}')
+    return await tool.ainvoke(tool_call['args'])
+
+
+def _timed_out(tool_call: dict, timeout: float) -> str:
+    print(f'Timed out: {tool_call["name"]}')
+    return f'{tool_call["name"]} timed out after {timeout:g}s, answer with the results you have or retry'
+
+
+def _failed(tool_call: dict, error: Exception) -> str:
+    print(f'Failed: {tool_call["name"]}: {error}')
+    return f'{tool_call["name"]} failed: {error}'
+
+
+def _tool_message(tool_call: dict, result, seconds: float = 0.0, status: str = 'ok') -> ToolMessage:
+    content = result if isinstance(result, str) else compact_dumps(result)
+    # Wall time and outcome of the call, for tool_end stream events; not sent to the LLM.
+    return ToolMessage(tool_call_id=tool_call['id'], name=tool_call['name'], content=content,
+                       response_metadata={'seconds': round(seconds, 3), 'status': status})
+
+
+def skipped_tool_calls(tool_calls: list) -> list[ToolMessage]:
+    '''Answer tool calls over the run's tool call budget without running them.'''
+    return [_tool_message(t, f'{t["name"]} skipped: the tool call budget for this request is used up',
+                          status='skipped')
+            for t in tool_calls]
+
+
+def cancelled_tool_calls(tool_calls: list) -> list[ToolMessage]:
+    '''Answer tool calls of a run that was cancelled before they finished.'''
+    return [_tool_message(t, f'{t["name"]} was cancelled before it finished: the user left the request',
+                          status='cancelled')
+            for t in tool_calls]
+
+
+def run_tool_calls(tools: dict, tool_calls: list, timeout: float = TOOL_CALL_TIMEOUT) -> list[ToolMessage]:
+    '''
+    Run all tool calls of one LLM turn concurrently on a bounded pool.
+
+    ToolMessages come back in the order of `tool_calls`. A call that raises or
+    overruns `timeout` yields an error message for the LLM instead of failing
+    the whole turn, so one slow search never holds back the others.
+    '''
+    start = time.monotonic()
+    deadline = start + timeout
+    futures = [_executor.submit(_timed_invoke, tools, t) for t in tool_calls]
+    results = []
+    for t, future in zip(tool_calls, futures):
+        try:
+            result, seconds = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            message = _tool_message(t, result, seconds)
+        except FutureTimeoutError:
+            future.cancel()
+            message = _tool_message(t, _timed_out(t, timeout), time.monotonic() - start, 'timeout')
+        except Exception as e:
+            message = _tool_message(t, _failed(t, e), time.monotonic() - start, 'error')
+        results.append(message)
+    return results
+
+
+async def arun_tool_calls(tools: dict, tool_calls: list, timeout: float = TOOL_CALL_TIMEOUT,
+                          on_result: Optional[Callable[[ToolMessage], Awaitable]] = None) -> list[ToolMessage]:
+    '''
+    Awaitable `run_tool_calls`: tools with a coroutine run on the event loop, the rest on the pool.
+
+    `on_result` is awaited with each ToolMessage as soon as that call finishes.
+    '''
+
+    async def run(tool_call: dict) -> ToolMessage:
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            result = await asyncio.wait_for(_ainvoke(tools, tool_call), timeout)
+        except asyncio.TimeoutError:
+            result, status = _timed_out(tool_call, timeout), 'timeout'
+        except Exception as e:
+            result, status = _failed(tool_call, e), 'error'
+        message = _tool_message(tool_call, result, time.perf_counter() - start, status)
+        if on_result is not None:
+            await on_result(message)
+        return message
+
+    return list(await asyncio.gather(*(run(t) for t in tool_calls)))
@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from agents.tools.cache import cache_key
+from agents.tools.serpapi_client import SerpApiClient, SerpApiError, get_client
+
+MODES = ('live', 'record', 'replay')
+DEFAULT_CASSETTE_DIR = 'cassettes/serpapi'
+
+
+def parse_latency(spec: Optional[str], rng: random.Random = random) -> Optional[Callable[[dict], float]]:
+    '''
+    Parse a replay latency spec into a sampler of seconds.
+
+    Supported specs: `fixed:0.5`, `uniform:0.2,1.5`, `lognormal:MU,SIGMA`
+    (of the latency in seconds, e.g. `lognormal:-0.2,0.5` for a ~0.8s median)
+    and `recorded`, which replays the latency observed while recording.
+    Pass a seeded `rng` for reproducible samples.
+    '''
+    if not spec:
+        return None
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'fixed':
+        return lambda fixture: values[0]
+    if kind == 'uniform':
+        return lambda fixture: rng.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        return lambda fixture: rng.lognormvariate(values[0], values[1])
+    if kind == 'recorded':
+        return lambda fixture: fixture.get('elapsed', 0.0)
+    raise ValueError(f'Unknown latency spec: {spec}')
+
+
+class CassetteBackend:
+    '''
+    SerpAPI backend that records live responses to disk or replays them.
+
+    Each fixture is one JSON file holding the normalized request (without the
+    api_key), the response and the upstream latency, named by the hash of
+    the request. In `replay` mode no network is used at all: a missing
+    fixture raises SerpApiError like an upstream failure would.
+    '''
+
+    def __init__(self, mode: str, directory: str = DEFAULT_CASSETTE_DIR,
+                 latency: Optional[Callable[[dict], float]] = None, live: Optional[SerpApiClient] = None):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f'CassetteBackend mode must be record or replay, got {mode}')
+        self.mode = mode
+        self.directory = Path(directory)
+        self.latency = latency
+        self._live = live
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.replayed = 0
+        self.missing = 0
+
+    def _path(self, params: dict) -> Path:
+        return self.directory / f'{hashlib.sha256(cache_key(params).encode()).hexdigest()[:32]}.json'
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _load(self, params: dict) -> dict:
+        path = self._path(params)
+        if not path.exists():
+            self._count('missing')
+            raise SerpApiError(f'No recorded SerpAPI response for {cache_key(params)} in {self.directory}')
+        self._count('replayed')
+        return json.loads(path.read_text(encoding='utf-8'))
+
+    def _save(self, params: dict, data: dict, elapsed: float):
+        fixture = {
+            'request': json.loads(cache_key(params)),
+            'elapsed': round(elapsed, 4),
+            'response': data,
+        }
+        path = self._path(params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = json.dumps(fixture, ensure_ascii=False)
+        # A temp file of its own per write, so concurrent recordings of one request cannot mix.
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=path.parent, prefix=path.stem,
+                                         suffix='.tmp', delete=False) as tmp:
+            tmp.write(text)
+        os.replace(tmp.name, path)
+        self._count('recorded')
+
+    def _delay(self, fixture: dict) -> float:
+        return max(0.0, self.latency(fixture)) if self.latency else 0.0
+
+    def search(self, params: dict, timeout: Optional[float] = None) -> dict:
+        if self.mode == 'replay':
+            fixture = self._load(params)
+            time.sleep(self._delay(fixture))
+            return fixture['response']
+        started = time.monotonic()
+        data = self._live.search(params, timeout=timeout)
+        self._save(params, data, time.monotonic() - started)
+        return data
+
+    async def asearch(self, params: dict, timeout: Optional[float] = None) -> dict:
+        if self.mode == 'replay':
+            fixture = await asyncio.to_thread(self._load, params)
+            await asyncio.sleep(self._delay(fixture))
+            return fixture['response']
+        started = time.monotonic()
+        data = await self._live.asearch(params, timeout=timeout)
+        await asyncio.to_thread(self._save, params, data, time.monotonic() - started)
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'directory': str(self.directory),
+                'recorded': self.recorded,
+                'replayed': self.replayed,
+                'missing': self.missing,
+            }
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def backend_from_env():
+    '''Build the backend selected by SERPAPI_MODE (live, record or replay).'''
+    mode = os.environ.get('SERPAPI_MODE', 'live')
+    if mode not in MODES:
+        raise ValueError(f'SERPAPI_MODE must be one of {MODES}, got {mode}')
+    if mode == 'live':
+        return get_client()
+    return CassetteBackend(
+        mode,
+        directory=os.environ.get('SERPAPI_CASSETTE_DIR', DEFAULT_CASSETTE_DIR),
+        latency=parse_latency(os.environ.get('SERPAPI_REPLAY_LATENCY')),
+        live=get_client()
+    )
+
+
+def get_backend():
+    '''Return the process-wide search backend used by the search tools.'''
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = backend_from_env()
+        return _backend
+
+
+def set_backend(backend):
+    '''Swap the search backend, e.g. a CassetteBackend for offline benchmarks.'''
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from agents.tools.redis_cache import redis_cache_from_env
+
+DEFAULT_TTL = 600
+DEFAULT_MAXSIZE = int(os.environ.get('SERPAPI_CACHE_SIZE', '256'))
+
+# Fares move faster than hotel inventory, so flights expire sooner.
+ENGINE_TTLS = {
+    'google_flights': 600,
+    'google_hotels': 1800,
+}
+
+# Fields that do not change the upstream answer and must not split the cache.
+_IGNORED_PARAMS = {'api_key', 'output'}
+_UPPERCASE_PARAMS = {'departure_id', 'arrival_id'}
+
+
+def engine_ttl(engine: str) -> float:
+    '''TTL in seconds for `engine`, overridable with SERPAPI_CACHE_TTL_<ENGINE>.'''
+    override = os.environ.get(f'SERPAPI_CACHE_TTL_{engine.upper()}')
+    if override is not None:
+        return float(override)
+    return ENGINE_TTLS.get(engine, DEFAULT_TTL)
+
+
+def cache_key(params: dict) -> str:
+    '''
+    Build a stable key from SerpAPI search params.
+
+    The api_key is excluded, unset fields are dropped and values are compared
+    as stripped strings, so `adults=1` and `adults='1'` or `mad` and `MAD`
+    share one entry.
+    '''
+    normalized = {}
+    for name, value in params.items():
+        if name in _IGNORED_PARAMS or value is None:
+            continue
+        value = str(value).strip()
+        normalized[name] = value.upper() if name in _UPPERCASE_PARAMS else value.lower()
+    return json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+
+
+class TTLCache:
+    '''
+    Thread-safe in-process cache with per-entry TTL and LRU eviction.
+
+    Cached values are shared between callers and must be treated as read-only.
+    '''
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._data: 'OrderedDict[str, tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: float):
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class TieredCache:
+    '''
+    In-memory L1 in front of an optional shared L2 (see redis_cache.RedisCache).
+
+    L2 hits are copied into L1 for their remaining TTL, writes go to both
+    tiers. The async methods push L2 I/O onto a worker thread so a slow Redis
+    never blocks the event loop.
+    '''
+
+    def __init__(self, l1: TTLCache, l2=None):
+        self.l1 = l1
+        self.l2 = l2
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        hit, value = self.l1.get(key)
+        if hit or self.l2 is None:
+            return hit, value
+        hit, value, ttl = self.l2.lookup(key)
+        if hit:
+            self.l1.set(key, value, ttl)
+        return hit, value
+
+    def set(self, key: str, value: Any, ttl: float):
+        self.l1.set(key, value, ttl)
+        if self.l2 is not None:
+            self.l2.set(key, value, ttl)
+
+    async def aget(self, key: str) -> tuple[bool, Any]:
+        hit, value = self.l1.get(key)
+        if hit or self.l2 is None:
+            return hit, value
+        hit, value, ttl = await asyncio.to_thread(self.l2.lookup, key)
+        if hit:
+            self.l1.set(key, value, ttl)
+        return hit, value
+
+    async def aset(self, key: str, value: Any, ttl: float):
+        self.l1.set(key, value, ttl)
+        if self.l2 is not None:
+            await asyncio.to_thread(self.l2.set, key, value, ttl)
+
+    def clear(self):
+        '''Empty both tiers; L2 only loses the search entries, other users of the Redis are untouched.'''
+        self.l1.clear()
+        if self.l2 is not None:
+            self.l2.clear()
+
+    def stats(self) -> dict:
+        return {
+            'l1': self.l1.stats(),
+            'l2': self.l2.stats() if self.l2 is not None else None,
+        }
+
+
+_result_cache: Optional[TieredCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> TieredCache:
+    '''Return the process-wide search result cache, shared through Redis when REDIS_URI is set.'''
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = TieredCache(TTLCache(), redis_cache_from_env(os.environ.get('REDIS_URI')))
+        return _result_cache
+
+
+def set_result_cache(cache: TieredCache):
+    '''Replace the process-wide cache, e.g. with a fakeredis-backed tier for local runs.'''
+    global _result_cache
+    with _result_cache_lock:
+        _result_cache = cache
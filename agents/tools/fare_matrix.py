@@ -0,0 +1,151 @@
+import asyncio
+import datetime
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from langchain.pydantic_v1 import BaseModel, Field
+from langchain_core.tools import StructuredTool
+
+from agents.tools.flights_finder import FlightsInput, search_params
+from agents.tools.search import asearch, search
+
+MAX_SEARCHES = int(os.environ.get('FARE_MATRIX_MAX_SEARCHES', '20'))
+CONCURRENCY = int(os.environ.get('FARE_MATRIX_CONCURRENCY', '4'))
+# Longest outbound or return window, checked before any date pairs are enumerated.
+MAX_WINDOW_DAYS = int(os.environ.get('FARE_MATRIX_MAX_DAYS', '31'))
+CHEAPEST = 3
+
+
+class FareMatrixInput(BaseModel):
+    departure_airport: str = Field(description='Departure airport code (IATA)')
+    arrival_airport: str = Field(description='Arrival airport code (IATA)')
+    outbound_date_from: str = Field(description='First possible outbound date. The format is YYYY-MM-DD. e.g. 2024-10-01')
+    outbound_date_to: str = Field(description='Last possible outbound date. The format is YYYY-MM-DD. e.g. 2024-10-07')
+    return_date_from: Optional[str] = Field(None, description='First possible return date. The format is YYYY-MM-DD. Leave empty for one way.')
+    return_date_to: Optional[str] = Field(None, description='Last possible return date. The format is YYYY-MM-DD. Leave empty for one way.')
+    adults: Optional[int] = Field(1, description='Parameter defines the number of adults. Default to 1.')
+    children: Optional[int] = Field(0, description='Parameter defines the number of children. Default to 0.')
+
+
+class FareMatrixInputSchema(BaseModel):
+    params: FareMatrixInput
+
+
+def _days(start: str, end: str) -> list[str]:
+    first, last = datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)
+    if last < first:
+        raise ValueError(f'The date window {start} to {end} ends before it starts')
+    if (last - first).days + 1 > MAX_WINDOW_DAYS:
+        raise ValueError(f'The date window {start} to {end} is longer than {MAX_WINDOW_DAYS} days; '
+                         f'ask for a shorter window')
+    return [(first + datetime.timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+def _date_pairs(params: FareMatrixInput) -> list[tuple[str, Optional[str]]]:
+    outbound = _days(params.outbound_date_from, params.outbound_date_to)
+    if not params.return_date_from:
+        return [(day, None) for day in outbound]
+    returns = _days(params.return_date_from, params.return_date_to or params.return_date_from)
+    return [(out, back) for out in outbound for back in returns if back >= out]
+
+
+def _within_budget(pairs: list, budget: int) -> list:
+    # Spread the quota evenly over the grid rather than only covering its first rows.
+    if budget <= 0:
+        return []
+    if len(pairs) <= budget:
+        return pairs
+    step = len(pairs) / budget
+    return [pairs[int(i * step)] for i in range(budget)]
+
+
+def _cell_params(params: FareMatrixInput, outbound: str, back: Optional[str]) -> dict:
+    return search_params(FlightsInput(
+        departure_airport=params.departure_airport,
+        arrival_airport=params.arrival_airport,
+        outbound_date=outbound,
+        return_date=back,
+        adults=params.adults,
+        children=params.children
+    ))
+
+
+def _lowest_price(data: dict) -> Optional[int]:
+    prices = [option['price'] for option in data.get('best_flights', []) + data.get('other_flights', [])
+              if option.get('price') is not None]
+    return min(prices) if prices else None
+
+
+def _matrix(params: FareMatrixInput, pairs: list, cells: list, total: int) -> dict:
+    matrix = {}
+    priced = []
+    for (outbound, back), price in zip(pairs, cells):
+        matrix.setdefault(outbound, {})[back or 'one_way'] = price
+        if price is not None:
+            priced.append({'outbound': outbound, 'return': back, 'price': price})
+    return {
+        'route': f'{params.departure_airport}-{params.arrival_airport}',
+        'currency': 'USD',
+        'matrix': matrix,
+        'cheapest': sorted(priced, key=lambda cell: cell['price'])[:CHEAPEST],
+        'searched': len(pairs),
+        'skipped': total - len(pairs),
+        'failed': sum(price is None for price in cells),
+    }
+
+
+def _fare_matrix(params: FareMatrixInput):
+    '''
+    Find the cheapest travel dates for a route across a window of outbound
+    (and optionally return) dates, in a single call. Use this instead of calling
+    flights_finder date by date when the user is flexible on dates.
+
+    Returns:
+        dict: Lowest price per date pair and the cheapest date pairs.
+    '''
+
+    try:
+        all_pairs = _date_pairs(params)
+    except ValueError as e:
+        return str(e)
+    pairs = _within_budget(all_pairs, MAX_SEARCHES)
+
+    def cell(pair):
+        try:
+            return _lowest_price(search(_cell_params(params, *pair)))
+        except Exception as e:
+            print(f'Fare matrix cell {pair} failed: {e}')
+            return None
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix='fare-matrix') as executor:
+        cells = list(executor.map(cell, pairs))
+    return _matrix(params, pairs, cells, len(all_pairs))
+
+
+async def _afare_matrix(params: FareMatrixInput):
+    try:
+        all_pairs = _date_pairs(params)
+    except ValueError as e:
+        return str(e)
+    pairs = _within_budget(all_pairs, MAX_SEARCHES)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def cell(pair):
+        async with semaphore:
+            try:
+                return _lowest_price(await asearch(_cell_params(params, *pair)))
+            except Exception as e:
+                print(f'Fare matrix cell {pair} failed: {e}')
+                return None
+
+    cells = await asyncio.gather(*(cell(pair) for pair in pairs))
+    return _matrix(params, pairs, cells, len(all_pairs))
+
+
+fare_matrix = StructuredTool.from_function(
+    func=_fare_matrix,
+    coroutine=_afare_matrix,
+    name='fare_matrix',
+    args_schema=FareMatrixInputSchema
+)
@@ -2,9 +2,11 @@ import os
 from typing import Optional
 
 # from pydantic import BaseModel, Field
-import serpapi
 from langchain.pydantic_v1 import BaseModel, Field
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
+
+from agents.tools.projection import project_flights, projection_stats
+from agents.tools.search import asearch, search
 
 
 class FlightsInput(BaseModel):
@@ -22,16 +24,9 @@ class FlightsInputSchema(BaseModel):
     params: FlightsInput
 
 
-@tool(args_schema=FlightsInputSchema)
-def flights_finder(params: FlightsInput):
-    '''
-    Find flights using the Google Flights engine.
-
-    Returns:
-        dict: Flight search results.
-    '''
-
-    params = {
+def search_params(params: FlightsInput) -> dict:
+    '''SerpAPI Google Flights query for `params`, shared by the flight tools and the prefetcher.'''
+    return {
         'api_key': os.environ.get('SERPAPI_API_KEY'),
         'engine': 'google_flights',
         'hl': 'en',
@@ -48,9 +43,46 @@ def flights_finder(params: FlightsInput):
         'children': params.children
     }
 
+
+def _best_flights(data: dict) -> dict:
+    results = project_flights(data)
+    projection_stats.record(data.get('best_flights', []), results)
+    return results
+
+
+def _flights_finder(params: FlightsInput):
+    '''
+    Find flights using the Google Flights engine.
+
+    Returns:
+        dict: Best flight options with price, times, airline, logo and booking link.
+    '''
+
     try:
-        search = serpapi.search(params)
-        results = search.data['best_flights']
+        data = search(search_params(params))
+        results = _best_flights(data)
     except Exception as e:
         results = str(e)
     return results
+
+
+async def afind_flights(params: FlightsInput) -> dict:
+    '''Search and project flights, raising on failure; shared by the tool and the structured search API.'''
+    return _best_flights(await asearch(search_params(params)))
+
+
+async def _aflights_finder(params: FlightsInput):
+    try:
+        results = await afind_flights(params)
+    except Exception as e:
+        results = str(e)
+    return results
+
+
+# `invoke` keeps the blocking path for LangGraph Studio, `ainvoke` awaits the pooled async client.
+flights_finder = StructuredTool.from_function(
+    func=_flights_finder,
+    coroutine=_aflights_finder,
+    name='flights_finder',
+    args_schema=FlightsInputSchema
+)
@@ -1,9 +1,11 @@
 import os
 from typing import Optional
 
-import serpapi
 from langchain.pydantic_v1 import BaseModel, Field
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
+
+from agents.tools.projection import project_hotels, projection_stats
+from agents.tools.search import asearch, search
 
 # from pydantic import BaseModel, Field
 
@@ -24,16 +26,8 @@ class HotelsInputSchema(BaseModel):
     params: HotelsInput
 
 
-@tool(args_schema=HotelsInputSchema)
-def hotels_finder(params: HotelsInput):
-    '''
-    Find hotels using the Google Hotels engine.
-
-    Returns:
-        dict: Hotel search results.
-    '''
-
-    params = {
+def _search_params(params: HotelsInput) -> dict:
+    return {
         'api_key': os.environ.get('SERPAPI_API_KEY'),
         'engine': 'google_hotels',
         'hl': 'en',
@@ -49,6 +43,46 @@ def hotels_finder(params: HotelsInput):
         'hotel_class': params.hotel_class
     }
 
-    search = serpapi.search(params)
-    results = search.data
-    return results['properties'][:5]
+
+def _top_hotels(data: dict) -> list:
+    properties = data.get('properties', [])[:5]
+    results = project_hotels(properties)
+    projection_stats.record(properties, results)
+    return results
+
+
+def _hotels_finder(params: HotelsInput):
+    '''
+    Find hotels using the Google Hotels engine.
+
+    Returns:
+        list: Top hotels with rate, total, rating, class, amenities and link.
+    '''
+
+    try:
+        results = _top_hotels(search(_search_params(params)))
+    except Exception as e:
+        results = str(e)
+    return results
+
+
+async def afind_hotels(params: HotelsInput) -> list:
+    '''Search and project hotels, raising on failure; shared by the tool and the structured search API.'''
+    return _top_hotels(await asearch(_search_params(params)))
+
+
+async def _ahotels_finder(params: HotelsInput):
+    try:
+        results = await afind_hotels(params)
+    except Exception as e:
+        results = str(e)
+    return results
+
+
+# `invoke` keeps the blocking path for LangGraph Studio, `ainvoke` awaits the pooled async client.
+hotels_finder = StructuredTool.from_function(
+    func=_hotels_finder,
+    coroutine=_ahotels_finder,
+    name='hotels_finder',
+    args_schema=HotelsInputSchema
+)
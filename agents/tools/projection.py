@@ -0,0 +1,106 @@
+import json
+import threading
+from typing import Any, Optional
+
+from agents import metrics
+
+MAX_AMENITIES = 8
+
+# Rough chars-per-token ratio for JSON-heavy Gemini prompts, good enough for reporting.
+CHARS_PER_TOKEN = 4
+
+
+def compact_dumps(value: Any) -> str:
+    '''Serialize a tool result for the conversation without whitespace padding.'''
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def _drop_empty(record: dict) -> dict:
+    return {k: v for k, v in record.items() if v not in (None, '', [], {})}
+
+
+def _airport(airport: dict) -> Optional[str]:
+    if not airport:
+        return None
+    return f"{airport.get('id', '')} {airport.get('time', '')}".strip()
+
+
+def project_flight(option: dict) -> dict:
+    '''Reduce one `best_flights` option to what the agent shows the user.'''
+    legs = option.get('flights') or [{}]
+    first, last = legs[0], legs[-1]
+    return _drop_empty({
+        'price': option.get('price'),
+        'type': option.get('type'),
+        'duration': option.get('total_duration'),
+        'airline': first.get('airline'),
+        'logo': option.get('airline_logo') or first.get('airline_logo'),
+        'class': first.get('travel_class'),
+        'depart': _airport(first.get('departure_airport')),
+        'arrive': _airport(last.get('arrival_airport')),
+        'flights': [leg.get('flight_number') for leg in legs if leg.get('flight_number')],
+        'stops': [layover.get('id') or layover.get('name') for layover in option.get('layovers', [])],
+    })
+
+
+def project_flights(data: dict) -> dict:
+    '''Project a google_flights response, keeping the shared booking link once.'''
+    return _drop_empty({
+        'link': data.get('search_metadata', {}).get('google_flights_url'),
+        'flights': [project_flight(option) for option in data.get('best_flights', [])],
+    })
+
+
+def project_hotel(hotel: dict) -> dict:
+    '''Reduce one google_hotels property to what the agent shows the user.'''
+    images = hotel.get('images') or [{}]
+    return _drop_empty({
+        'name': hotel.get('name'),
+        'link': hotel.get('link'),
+        'logo': images[0].get('thumbnail'),
+        'class': hotel.get('hotel_class'),
+        'rating': hotel.get('overall_rating'),
+        'reviews': hotel.get('reviews'),
+        'rate_per_night': hotel.get('rate_per_night', {}).get('lowest'),
+        'total': hotel.get('total_rate', {}).get('lowest'),
+        'amenities': hotel.get('amenities', [])[:MAX_AMENITIES],
+    })
+
+
+def project_hotels(properties: list) -> list:
+    return [project_hotel(hotel) for hotel in properties]
+
+
+class ProjectionStats:
+    '''Running totals of how much each projection shrinks the tool payloads.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.results = 0
+        self.raw_bytes = 0
+        self.projected_bytes = 0
+
+    def record(self, raw: Any, projected: Any):
+        raw_bytes = len(compact_dumps(raw).encode())
+        projected_bytes = len(compact_dumps(projected).encode())
+        with self._lock:
+            self.results += 1
+            self.raw_bytes += raw_bytes
+            self.projected_bytes += projected_bytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            saved = self.raw_bytes - self.projected_bytes
+            return {
+                'results': self.results,
+                'raw_bytes': self.raw_bytes,
+                'projected_bytes': self.projected_bytes,
+                'saved_bytes': saved,
+                'saved_tokens_estimate': saved // CHARS_PER_TOKEN,
+                'ratio': round(self.projected_bytes / self.raw_bytes, 4) if self.raw_bytes else 0.0,
+            }
+
+
+projection_stats = ProjectionStats()
+
+metrics.register('tool_projection', projection_stats.stats)
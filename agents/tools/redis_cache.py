@@ -0,0 +1,125 @@
+import hashlib
+import json
+import threading
+import zlib
+from typing import Any, Optional
+
+try:
+    import redis
+except ImportError:  # redis is only needed when REDIS_URI is configured
+    redis = None
+
+KEY_PREFIX = 'travel-agent:search:'
+COMPRESSION_LEVEL = 6
+
+
+class RedisCache:
+    '''
+    Shared second-level cache for search results.
+
+    Values are stored as zlib-compressed JSON under a hashed key with a Redis
+    TTL, so every worker and replica pointed at the same Redis shares hits.
+    Any Redis failure is counted and treated as a miss: the cache must never
+    take the search tools down with it.
+
+    Works with any redis-py compatible client, e.g. `fakeredis.FakeRedis()`
+    for local runs without a server.
+    '''
+
+    def __init__(self, client, prefix: str = KEY_PREFIX):
+        self._redis = client
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.bytes_written = 0
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> 'RedisCache':
+        if redis is None:
+            raise ImportError('REDIS_URI is set but the `redis` package is not installed')
+        # Short socket timeouts: a slow cache must cost less than the search it saves.
+        client = redis.Redis.from_url(url, socket_connect_timeout=0.5, socket_timeout=0.5)
+        return cls(client, **kwargs)
+
+    def _key(self, key: str) -> str:
+        return self.prefix + hashlib.sha256(key.encode()).hexdigest()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def lookup(self, key: str) -> tuple[bool, Any, float]:
+        '''Return (hit, value, remaining TTL in seconds).'''
+        try:
+            pipe = self._redis.pipeline()
+            pipe.get(self._key(key))
+            pipe.pttl(self._key(key))
+            blob, pttl = pipe.execute()
+        except Exception as e:
+            print(f'Redis cache read failed: {e}')
+            self._count('errors')
+            return False, None, 0
+        if blob is None or pttl is None or pttl <= 0:
+            self._count('misses')
+            return False, None, 0
+        try:
+            value = json.loads(zlib.decompress(blob))
+        except (zlib.error, ValueError) as e:
+            print(f'Redis cache entry is corrupt, ignoring it: {e}')
+            self._count('errors')
+            self._count('misses')
+            return False, None, 0
+        self._count('hits')
+        return True, value, pttl / 1000
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        hit, value, _ = self.lookup(key)
+        return hit, value
+
+    def set(self, key: str, value: Any, ttl: float):
+        if ttl <= 0:
+            return
+        blob = zlib.compress(json.dumps(value, separators=(',', ':')).encode(), COMPRESSION_LEVEL)
+        try:
+            self._redis.set(self._key(key), blob, px=int(ttl * 1000))
+        except Exception as e:
+            print(f'Redis cache write failed: {e}')
+            self._count('errors')
+            return
+        self._count('bytes_written', len(blob))
+
+    def clear(self) -> int:
+        '''Delete every entry under this cache's prefix, leaving other keys alone; returns how many.'''
+        try:
+            keys = list(self._redis.scan_iter(match=self.prefix + '*', count=500))
+            if keys:
+                self._redis.delete(*keys)
+        except Exception as e:
+            print(f'Redis cache clear failed: {e}')
+            self._count('errors')
+            return 0
+        return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'bytes_written': self.bytes_written,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def redis_cache_from_env(url: Optional[str]) -> Optional[RedisCache]:
+    '''Build the shared cache tier from REDIS_URI, or None to run with L1 only.'''
+    if not url:
+        return None
+    try:
+        return RedisCache.from_url(url)
+    except Exception as e:
+        print(f'Redis cache disabled: {e}')
+        return None
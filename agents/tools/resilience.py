@@ -0,0 +1,292 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
+import httpx
+
+from agents.tools.serpapi_client import SerpApiError
+
+DEFAULT_DEADLINE = 20.0
+ENGINE_DEADLINES = {
+    'google_flights': 20.0,
+    'google_hotels': 15.0,
+}
+
+BREAKER_WINDOW = int(os.environ.get('SERPAPI_BREAKER_WINDOW', '20'))
+BREAKER_MIN_CALLS = int(os.environ.get('SERPAPI_BREAKER_MIN_CALLS', '5'))
+BREAKER_FAILURE_RATE = float(os.environ.get('SERPAPI_BREAKER_FAILURE_RATE', '0.5'))
+BREAKER_COOLDOWN = float(os.environ.get('SERPAPI_BREAKER_COOLDOWN', '30'))
+
+# Blocking searches run on these threads so their deadline is wall-clock; hedges share them.
+UPSTREAM_WORKERS = int(os.environ.get('SERPAPI_WORKERS', '32'))
+HEDGE_ENABLED = os.environ.get('SERPAPI_HEDGE', '0') == '1'
+HEDGE_MIN_SAMPLES = 20
+HEDGE_PERCENTILE = 0.95
+LATENCY_SAMPLES = 200
+
+
+class CircuitOpenError(SerpApiError):
+    '''Raised without calling upstream while an engine's breaker is open.'''
+
+
+def engine_deadline(engine: str) -> float:
+    '''Deadline in seconds for `engine`, overridable with SERPAPI_DEADLINE_<ENGINE>.'''
+    override = os.environ.get(f'SERPAPI_DEADLINE_{engine.upper()}')
+    if override is not None:
+        return float(override)
+    return ENGINE_DEADLINES.get(engine, DEFAULT_DEADLINE)
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    '''True for errors that say SerpAPI is unhealthy: deadlines, transport errors, 429s and 5xx.'''
+    # A 4xx for bad params or an empty result is the caller's problem, not an outage,
+    # and neither is a bug or a cancelled request on our side.
+    if isinstance(error, SerpApiError):
+        return error.status_code is not None and (error.status_code == 429 or error.status_code >= 500)
+    return isinstance(error, (TimeoutError, httpx.TransportError))
+
+
+class CircuitBreaker:
+    '''
+    Rolling-window circuit breaker.
+
+    Opens once at least `min_calls` of the last `window` calls were recorded
+    and the failure rate reaches `failure_rate`. After `cooldown` seconds a
+    single probe is let through (half-open); its outcome closes or re-opens
+    the breaker.
+    '''
+
+    def __init__(self, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 failure_rate: float = BREAKER_FAILURE_RATE, cooldown: float = BREAKER_COOLDOWN):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success: bool):
+        with self._lock:
+            if self.state == 'half_open':
+                self._probing = False
+                if success:
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (self.state == 'closed' and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_rate):
+                self._open()
+
+    def abandon(self):
+        '''Forget a call that ended without an outcome, e.g. cancelled: a half-open probe frees its slot.'''
+        with self._lock:
+            if self.state == 'half_open':
+                self._probing = False
+
+    def _open(self):
+        self.state = 'open'
+        self._opened_at = time.monotonic()
+        self.opened += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'failure_rate': round(self._outcomes.count(False) / len(self._outcomes), 4) if self._outcomes else 0.0,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
+
+
+class _EngineState:
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE))]
+
+
+class UpstreamGuard:
+    '''
+    Deadlines, per-engine circuit breakers and optional hedging around a search backend.
+
+    Deadlines bound the whole call, including time spent waiting for a
+    worker, not just each socket read.
+
+    With hedging on, a duplicate request is sent once the first one has been
+    outstanding longer than the engine's observed p95 latency, and whichever
+    answers first wins. Hedging trades SerpAPI quota for tail latency, so it
+    is off unless SERPAPI_HEDGE=1.
+    '''
+
+    def __init__(self, hedge: bool = HEDGE_ENABLED):
+        self.hedge = hedge
+        self._engines: dict[str, _EngineState] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix='serpapi')
+
+    def _engine(self, engine: str) -> _EngineState:
+        with self._lock:
+            if engine not in self._engines:
+                self._engines[engine] = _EngineState()
+            return self._engines[engine]
+
+    def _admit(self, engine: str, state: _EngineState):
+        if not state.breaker.allow():
+            raise CircuitOpenError(f'{engine} is failing, circuit open; try again later')
+
+    def _record(self, state: _EngineState, started: float, error: Optional[BaseException] = None):
+        if isinstance(error, asyncio.CancelledError):
+            # Our caller gave up, which says nothing about SerpAPI's health.
+            state.breaker.abandon()
+            return
+        if error is None:
+            with self._lock:
+                state.latencies.append(time.monotonic() - started)
+        state.breaker.record(error is None or not is_upstream_failure(error))
+
+    def _hedge_won(self, state: _EngineState):
+        with self._lock:
+            state.hedge_wins += 1
+
+    def search(self, backend, params: dict) -> dict:
+        engine = params['engine']
+        state = self._engine(engine)
+        self._admit(engine, state)
+        deadline = engine_deadline(engine)
+        started = time.monotonic()
+        try:
+            delay = state.hedge_delay() if self.hedge else None
+            if delay is None:
+                data = self._bounded(backend, params, deadline)
+            else:
+                data = self._hedged(backend, params, state, delay, deadline)
+        except BaseException as e:
+            self._record(state, started, e)
+            raise
+        self._record(state, started)
+        return data
+
+    def _bounded(self, backend, params: dict, deadline: float) -> dict:
+        # The HTTP timeout applies per read, not to the whole call, so the wall clock is enforced here.
+        future = self._executor.submit(backend.search, params, deadline)
+        try:
+            return future.result(timeout=deadline)
+        except TimeoutError:
+            if future.done():  # the backend's own timeout
+                raise
+            future.cancel()
+            raise TimeoutError(f'{params["engine"]} search exceeded its {deadline:g}s deadline') from None
+
+    def _hedged(self, backend, params: dict, state: _EngineState, delay: float, deadline: float) -> dict:
+        primary = self._executor.submit(backend.search, params, deadline)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        with self._lock:
+            state.hedged += 1
+        hedge = self._executor.submit(backend.search, params, deadline)
+        pending = {primary, hedge}
+        remaining = deadline - delay
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._hedge_won(state)
+                    return future.result()
+                error = future.exception()
+        if error is not None:
+            raise error
+        raise TimeoutError(f'{params["engine"]} search exceeded its {deadline:g}s deadline')
+
+    async def asearch(self, backend, params: dict) -> dict:
+        engine = params['engine']
+        state = self._engine(engine)
+        self._admit(engine, state)
+        deadline = engine_deadline(engine)
+        started = time.monotonic()
+        try:
+            delay = state.hedge_delay() if self.hedge else None
+            if delay is None:
+                data = await asyncio.wait_for(backend.asearch(params, timeout=deadline), deadline)
+            else:
+                data = await asyncio.wait_for(self._ahedged(backend, params, state, delay, deadline), deadline)
+        except BaseException as e:
+            self._record(state, started, e)
+            raise
+        self._record(state, started)
+        return data
+
+    async def _ahedged(self, backend, params: dict, state: _EngineState, delay: float, deadline: float) -> dict:
+        primary = asyncio.ensure_future(backend.asearch(params, timeout=deadline))
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        with self._lock:
+            state.hedged += 1
+        hedge = asyncio.ensure_future(backend.asearch(params, timeout=deadline))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._hedge_won(state)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            engines = dict(self._engines)
+        report = {}
+        for engine, state in engines.items():
+            delay = state.hedge_delay()
+            report[engine] = {
+                'deadline': engine_deadline(engine),
+                'breaker': state.breaker.stats(),
+                'p95_latency': round(delay, 3) if delay is not None else None,
+                'hedged': state.hedged,
+                'hedge_wins': state.hedge_wins,
+                'hedge_win_rate': round(state.hedge_wins / state.hedged, 4) if state.hedged else 0.0,
+            }
+        return {'hedging': self.hedge, 'engines': report}
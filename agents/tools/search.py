@@ -0,0 +1,57 @@
+from agents import metrics
+from agents.tools.backends import get_backend
+from agents.tools.cache import cache_key, engine_ttl, get_result_cache
+from agents.tools.resilience import UpstreamGuard, engine_deadline
+from agents.tools.singleflight import SingleFlight
+from agents.tools.speculation import Speculation
+
+# Identical searches already on their way upstream are joined rather than repeated.
+in_flight = SingleFlight()
+# Deadlines, circuit breakers and hedging between the tools and SerpAPI.
+upstream = UpstreamGuard()
+# Searches started ahead of the model's tool call (see agents.prefetch).
+speculation = Speculation()
+
+
+def search(params: dict, speculative: bool = False) -> dict:
+    '''Run a SerpAPI search, serving repeated queries from the result cache.'''
+    cache = get_result_cache()
+    key = cache_key(params)
+    if not speculative:
+        speculation.claim(key)
+    hit, data = cache.get(key)
+    if hit:
+        return data
+
+    def fetch():
+        data = upstream.search(get_backend(), params)
+        cache.set(key, data, ttl=engine_ttl(params['engine']))
+        return data
+
+    # The leader is bounded by the engine deadline, so followers need not wait any longer.
+    return in_flight.do(key, fetch, timeout=engine_deadline(params['engine']))
+
+
+async def asearch(params: dict, speculative: bool = False) -> dict:
+    '''Awaitable counterpart of `search` sharing the same cache.'''
+    cache = get_result_cache()
+    key = cache_key(params)
+    if not speculative:
+        speculation.claim(key)
+    hit, data = await cache.aget(key)
+    if hit:
+        return data
+
+    async def fetch():
+        data = await upstream.asearch(get_backend(), params)
+        await cache.aset(key, data, ttl=engine_ttl(params['engine']))
+        return data
+
+    return await in_flight.ado(key, fetch, timeout=engine_deadline(params['engine']))
+
+
+metrics.register('search_cache', lambda: get_result_cache().stats())
+metrics.register('search_coalescing', in_flight.stats)
+metrics.register('search_backend', lambda: get_backend().stats())
+metrics.register('search_upstream', upstream.stats)
+metrics.register('search_speculation', speculation.stats)
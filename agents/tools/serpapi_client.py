@@ -0,0 +1,133 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+
+SERPAPI_URL = 'https://serpapi.com/search'
+DEFAULT_TIMEOUT = float(os.environ.get('SERPAPI_TIMEOUT', '30'))
+MAX_CONNECTIONS = int(os.environ.get('SERPAPI_MAX_CONNECTIONS', '20'))
+
+
+class SerpApiError(Exception):
+    '''Raised when SerpAPI answers with an error payload or a non-2xx status.'''
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SerpApiClient:
+    '''
+    Keep-alive SerpAPI client shared by the search tools.
+
+    The blocking `search` and the awaitable `asearch` each reuse one pooled
+    HTTP client, so repeated searches skip the TCP/TLS handshake. Async pools
+    are kept per event loop because an httpx.AsyncClient cannot be shared
+    across loops.
+    '''
+
+    def __init__(self, base_url: str = SERPAPI_URL, timeout: float = DEFAULT_TIMEOUT,
+                 max_connections: int = MAX_CONNECTIONS):
+        self.base_url = base_url
+        self.timeout = timeout
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client: Optional[httpx.Client] = None
+        self._async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(limits=self._limits, timeout=self.timeout)
+            return self._client
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(limits=self._limits, timeout=self.timeout)
+                self._async_clients[loop] = client
+            return client
+
+    @staticmethod
+    def _query(params: dict) -> dict:
+        # SerpAPI treats an empty value as a real filter, so unset fields are dropped.
+        query = {k: v for k, v in params.items() if v is not None}
+        query.setdefault('output', 'json')
+        return query
+
+    def _parse(self, response: httpx.Response) -> dict:
+        with self._lock:
+            self.requests += 1
+        try:
+            return self._parse_body(response)
+        except SerpApiError:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    @staticmethod
+    def _parse_body(response: httpx.Response) -> dict:
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise SerpApiError(f'SerpAPI returned HTTP {response.status_code} with a non-JSON body',
+                               response.status_code) from e
+        if response.status_code >= 400 or 'error' in data:
+            raise SerpApiError(data.get('error') or f'SerpAPI returned HTTP {response.status_code}',
+                               response.status_code)
+        return data
+
+    def search(self, params: dict, timeout: Optional[float] = None) -> dict:
+        response = self._sync_client().get(self.base_url, params=self._query(params),
+                                           timeout=timeout or self.timeout)
+        return self._parse(response)
+
+    async def asearch(self, params: dict, timeout: Optional[float] = None) -> dict:
+        response = await self._async_client().get(self.base_url, params=self._query(params),
+                                                  timeout=timeout or self.timeout)
+        return self._parse(response)
+
+    async def awarm(self):
+        '''Open a keep-alive connection for the running loop, so the first search skips DNS and TLS setup.'''
+        try:
+            await self._async_client().head(self.base_url, timeout=self.timeout)
+        except httpx.HTTPError as e:
+            print(f'SerpAPI warm-up failed: {e}')
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'mode': 'live', 'requests': self.requests, 'errors': self.errors}
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+_client: Optional[SerpApiClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> SerpApiClient:
+    '''Return the process-wide SerpAPI client, creating it on first use.'''
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = SerpApiClient()
+        return _client
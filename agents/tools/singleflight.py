@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    '''
+    Coalesce identical in-flight calls.
+
+    The first caller for a key (the leader) runs the work; callers arriving
+    while it is in flight (followers) wait for and share its result, or
+    re-raise its error. A follower gives up with TimeoutError after
+    `timeout` seconds, while the leader carries on. An async call runs as a
+    task of its own and is cancelled once no caller waits for it any more.
+    Nothing is remembered once the call finishes, so this complements the
+    result cache rather than replacing it.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self._tasks: dict[str, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.errors = 0
+        self.follower_timeouts = 0
+        self.abandoned = 0
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self.follower_timeouts += 1
+                raise TimeoutError(f'Joined search did not finish within {timeout:g}s')
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight = self._tasks.get(key)
+            # Tasks are bound to their loop; a caller on another loop runs on its own.
+            leader = flight is None or flight.task.get_loop() is not loop
+            if leader:
+                flight = self._tasks[key] = _Flight(loop.create_task(fn()))
+                self.leaders += 1
+                flight.task.add_done_callback(lambda t: self._forget(key, t))
+            else:
+                self.followers += 1
+            flight.waiters += 1
+        task = flight.task
+        try:
+            # Shield the shared task so one caller giving up does not cancel it for the others.
+            if leader:
+                return await asyncio.shield(task)
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), timeout)
+            except TimeoutError:
+                if task.done():  # the leader's own error
+                    raise
+                with self._lock:
+                    self.follower_timeouts += 1
+                raise TimeoutError(f'Joined search did not finish within {timeout:g}s') from None
+        finally:
+            with self._lock:
+                flight.waiters -= 1
+                abandoned = flight.waiters == 0 and not task.done()
+                if abandoned:
+                    self.abandoned += 1
+            if abandoned:
+                # Nobody is waiting any more, e.g. every caller's run was cancelled: stop the upstream call.
+                task.cancel()
+
+    def _forget(self, key: str, task: asyncio.Task):
+        with self._lock:
+            flight = self._tasks.get(key)
+            if flight is not None and flight.task is task:
+                del self._tasks[key]
+            if not task.cancelled() and task.exception() is not None:
+                self.errors += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls) + len(self._tasks),
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'errors': self.errors,
+                'follower_timeouts': self.follower_timeouts,
+                'abandoned': self.abandoned,
+            }
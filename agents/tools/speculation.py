@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+
+PREFETCH_CLAIM_WINDOW = float(os.environ.get('PREFETCH_CLAIM_WINDOW', '120'))
+
+
+class Speculation:
+    '''
+    Outcome of speculative searches, started before the model asked for them.
+
+    A speculative search is a hit when a real search for the same cache key
+    follows within `window` seconds (served from the cache, or joined while
+    still in flight) and wasted otherwise.
+    '''
+
+    def __init__(self, window: float = PREFETCH_CLAIM_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: dict[str, float] = {}
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+        self.errors = 0
+
+    def _expire(self, now: float):
+        for key, started in list(self._pending.items()):
+            if now - started > self.window:
+                del self._pending[key]
+                self.wasted += 1
+
+    def start(self, key: str) -> bool:
+        '''Register a speculative search; False if the same one is still pending.'''
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self._pending:
+                return False
+            self._pending[key] = now
+            self.started += 1
+            return True
+
+    def claim(self, key: str):
+        '''Called for every real search: counts a hit if it was speculated.'''
+        with self._lock:
+            if self._pending.pop(key, None) is not None:
+                self.hits += 1
+
+    def failed(self, key: str):
+        with self._lock:
+            if self._pending.pop(key, None) is not None:
+                self.errors += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            settled = self.hits + self.wasted
+            return {
+                'started': self.started,
+                'hits': self.hits,
+                'wasted': self.wasted,
+                'errors': self.errors,
+                'pending': len(self._pending),
+                'hit_ratio': round(self.hits / settled, 3) if settled else None,
+                'waste_ratio': round(self.wasted / settled, 3) if settled else None,
+            }
@@ -0,0 +1,111 @@
+# pylint: disable = print-used
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from agents import metrics
+
+# Kept free of LangChain and HTTP imports: this module is loaded first to time everything else.
+
+
+class Startup:
+    '''
+    Cold start of a server process: how long each phase took and whether it can serve yet.
+
+    Servers time their imports with `phase()`, then build the agent in the
+    background with `warm_up()`. `/health` stays a liveness check while
+    `/ready` follows `ready`.
+    '''
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.ready_after: Optional[float] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        # Requests waiting for warm-up, woken on their own loop by mark_ready.
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = round(time.perf_counter() - start, 3)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def mark_ready(self, error: Optional[str] = None):
+        with self._lock:
+            self.error = error
+            self.ready_after = round(time.perf_counter() - self.started, 3)
+            self._ready.set()
+            waiters, self._waiters = self._waiters, set()
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait_ready(self, timeout: float) -> bool:
+        '''Wait up to `timeout` seconds for warm-up without tying up a worker thread.'''
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if self.ready:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+        return self.ready
+
+    async def warm_up(self, build: Callable[[], None]):
+        '''Run `build` (graph and LLM construction) on a worker thread, then warm the pools on this loop.'''
+        error = None
+        try:
+            with self.phase('build agent'):
+                await asyncio.to_thread(build)
+            with self.phase('warm connection pools'):
+                await warm_pools()
+        except Exception as e:
+            print(f'Warm-up failed: {e}')
+            error = str(e)
+        self.mark_ready(error)
+        print(f'✅ Ready after {self.ready_after}s: {self.phases}')
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'error': self.error,
+                'ready_after': self.ready_after,
+                'uptime': round(time.perf_counter() - self.started, 3),
+                'phases': dict(self.phases),
+            }
+
+
+async def warm_pools():
+    '''Open the connections a first request would otherwise pay for: Redis and the live SerpAPI client.'''
+    from agents.tools.backends import get_backend
+    from agents.tools.cache import get_result_cache
+
+    cache = get_result_cache()
+    if cache.l2 is not None:
+        await asyncio.to_thread(cache.l2.lookup, 'warm-up')
+    backend = get_backend()
+    if hasattr(backend, 'awarm'):
+        await backend.awarm()
+
+
+startup = Startup()
+
+metrics.register('startup', startup.report)
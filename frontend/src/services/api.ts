@@ -4,9 +4,46 @@ export interface ChatMessage {
   timestamp: Date;
 }
 
-export interface StreamResponse {
-  message: string;
-  done: boolean;
+export type StreamEventType =
+  | 'run_start'
+  | 'tool_start'
+  | 'tool_end'
+  | 'token'
+  | 'final'
+  | 'error'
+  | 'done';
+
+export interface StreamEvent {
+  id: number;
+  event: StreamEventType;
+  // Every payload carries `t`, seconds since the stream started
+  data: {
+    t: number;
+    thread_id?: string;
+    text?: string;
+    name?: string;
+    seconds?: number;
+    status?: string;
+    message?: string;
+    [key: string]: unknown;
+  };
+}
+
+function parseEvent(block: string): StreamEvent | null {
+  let id = 0;
+  let event = 'message';
+  const data: string[] = [];
+  for (const line of block.split('\n')) {
+    if (line.startsWith(':')) continue; // heartbeat
+    const colon = line.indexOf(':');
+    const field = colon === -1 ? line : line.slice(0, colon);
+    const value = colon === -1 ? '' : line.slice(colon + 1).replace(/^ /, '');
+    if (field === 'id') id = Number(value);
+    else if (field === 'event') event = value;
+    else if (field === 'data') data.push(value);
+  }
+  if (data.length === 0) return null;
+  return { id, event: event as StreamEventType, data: JSON.parse(data.join('\n')) };
 }
 
 class ApiService {
@@ -29,58 +66,59 @@ class ApiService {
     }
   }
 
-  async *streamChat(message: string): AsyncGenerator<string, void, unknown> {
+  async *streamEvents(message: string): AsyncGenerator<StreamEvent, void, unknown> {
+    const response = await fetch(`${this.baseUrl}/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Accept: 'text/event-stream',
+      },
+      body: JSON.stringify({ message }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body?.getReader();
+    if (!reader) {
+      throw new Error('Response body is not readable');
+    }
+
+    const decoder = new TextDecoder();
+    let buffer = '';
+
     try {
-      const response = await fetch(`${this.baseUrl}/chat/stream`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ message }),
-      });
+      while (true) {
+        const { done, value } = await reader.read();
 
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
+        if (done) break;
 
-      const reader = response.body?.getReader();
-      if (!reader) {
-        throw new Error('Response body is not readable');
+        // Events are separated by a blank line; keep a trailing partial event for the next read
+        buffer += decoder.decode(value, { stream: true });
+        const blocks = buffer.split('\n\n');
+        buffer = blocks.pop() || '';
+
+        for (const block of blocks) {
+          const event = parseEvent(block);
+          if (!event) continue;
+          yield event;
+          if (event.event === 'done') return;
+        }
       }
+    } finally {
+      reader.releaseLock();
+    }
+  }
 
-      const decoder = new TextDecoder();
-      let buffer = '';
-
-      try {
-        while (true) {
-          const { done, value } = await reader.read();
-          
-          if (done) break;
-          
-          buffer += decoder.decode(value, { stream: true });
-          const lines = buffer.split('\n');
-          buffer = lines.pop() || '';
-
-          for (const line of lines) {
-            if (line.startsWith('data: ')) {
-              const data = line.slice(6);
-              if (data === '[DONE]') {
-                return;
-              }
-              try {
-                const parsed = JSON.parse(data);
-                if (parsed.message) {
-                  yield parsed.message;
-                }
-              } catch (e) {
-                // Skip invalid JSON lines
-                console.warn('Invalid JSON in stream:', data);
-              }
-            }
-          }
+  async *streamChat(message: string): AsyncGenerator<string, void, unknown> {
+    try {
+      for await (const event of this.streamEvents(message)) {
+        if (event.event === 'token' && event.data.text) {
+          yield event.data.text;
+        } else if (event.event === 'error') {
+          throw new Error(event.data.message || 'Stream error');
         }
-      } finally {
-        reader.releaseLock();
       }
     } catch (error) {
       console.error('Stream error:', error);
@@ -4,22 +4,36 @@ import asyncio
 import uuid
 import json
 import os
+from contextlib import aclosing
 from typing import AsyncGenerator, Optional
 from datetime import datetime
 
 print("🚀 Starting Journita Travel Agent for GCP...")
 
 try:
-    from dotenv import load_dotenv
+    from agents.warmup import startup
     
-    from fastapi import FastAPI, HTTPException, BackgroundTasks
-    from fastapi.middleware.cors import CORSMiddleware
-    from fastapi.responses import StreamingResponse, FileResponse
-    from fastapi.staticfiles import StaticFiles
-    from pydantic import BaseModel, Field
-    import uvicorn
+    # Import cost is part of the cold start, timed per group (see /ready and /metrics)
+    with startup.phase("import fastapi"):
+        from dotenv import load_dotenv
+        from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+        from fastapi.middleware.cors import CORSMiddleware
+        from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+        from fastapi.staticfiles import StaticFiles
+        from pydantic import BaseModel, Field
+        import uvicorn
     
-    from langchain_core.messages import HumanMessage
+    with startup.phase("import agent modules"):
+        # Kept free of LangChain: it is imported by the warm-up, after the port opens
+        from agents import metrics
+        from agents.admission import AdmissionRejected, admission
+        from agents.budget import budget_report, run_config
+        from agents.intent_cache import answer_cache, cached_answer
+        from agents.search_api import router as search_router
+        from agents.streaming import (
+            FINAL, RUN_START, SSE_HEADERS, TOKEN, TOOL_END_EVENT, TOOL_START_EVENT, sse_stream,
+            stream_agent_events,
+        )
     
     # Load environment variables
     load_dotenv()
@@ -33,17 +47,41 @@ try:
     print(f"🔑 SerpAPI: {'✅ Available' if HAS_SERPAPI else '❌ Missing'}")
     print(f"🤖 Real Integration: {'✅ Enabled' if REAL_INTEGRATION else '⚠️ Mock Mode'}")
     
-    # Try to import and create the real graph
+    # The graph and LLM clients are built in the background after startup, so the port opens right away
     real_graph = None
-    if REAL_INTEGRATION:
+    WARMUP_WAIT = float(os.getenv('WARMUP_WAIT', '20'))
+    
+    def build_real_graph():
+        """Import and create the real graph; runs on a worker thread during warm-up"""
+        global real_graph, REAL_INTEGRATION
+        if not REAL_INTEGRATION:
+            return
         try:
-            from agents.graph import create_graph
-            real_graph = create_graph()
+            with startup.phase("import agents.graph"):
+                from agents.graph import create_graph
+            with startup.phase("create graph"):
+                real_graph = create_graph()
             print("✅ Real LangGraph agent loaded!")
         except Exception as e:
             print(f"⚠️ Real agent failed, falling back to mock: {e}")
             REAL_INTEGRATION = False
     
+    async def agent_graph():
+        """The real graph, waiting briefly for warm-up if a request arrives first"""
+        if not await startup.wait_ready(WARMUP_WAIT):
+            raise HTTPException(status_code=503, detail="Agent is warming up, retry shortly",
+                                headers={"Retry-After": "5"})
+        if real_graph is None:
+            raise HTTPException(status_code=503, detail="Real agent is unavailable")
+        return real_graph
+    
+    async def admit_agent_run():
+        """Slot for one real-agent run; overload is shed with a fast 429 instead of slowing every run"""
+        try:
+            return await admission.admit()
+        except AdmissionRejected as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)}) from e
+    
     # Create FastAPI app
     app = FastAPI(
         title="🌍 Journita Travel Agent API ✈️",
@@ -66,6 +104,9 @@ Production-ready Travel Agent API deployed on Google Cloud Platform.
         allow_headers=["*"],
     )
     
+    # Structured flight/hotel search without the LLM
+    app.include_router(search_router)
+    
     # Serve static files (frontend)
     try:
         app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -87,6 +128,7 @@ Production-ready Travel Agent API deployed on Google Cloud Platform.
         timestamp: str
         mode: str = Field(description="'real' or 'mock'")
         processing_time: Optional[float] = None
+        metadata: dict = Field(default_factory=dict, description="Run details, e.g. budget exhaustion")
     
     # Mock data for fallback
     MOCK_FLIGHTS = [
@@ -102,55 +144,52 @@ Production-ready Travel Agent API deployed on Google Cloud Platform.
     ]
     
     # Real agent functions
-    async def query_real_agent(query: str, thread_id: str) -> str:
-        """Query the real LangGraph agent"""
+    async def query_real_agent(query: str, thread_id: str, first_turn: bool = True) -> tuple[str, dict]:
+        """Query the real LangGraph agent without blocking the event loop"""
+        from langchain_core.messages import HumanMessage
+        
+        graph = await agent_graph()
         try:
-            messages = [HumanMessage(content=query)]
-            config = {'configurable': {'thread_id': thread_id}}
+            # Repeated first-turn intents (same route, dates, party) skip the LLM loop
+            if first_turn:
+                cached = await cached_answer(graph, query, thread_id)
+                if cached is not None:
+                    return cached, {}
             
-            result = real_graph.invoke({'messages': messages}, config=config)
+            messages = [HumanMessage(content=query)]
+            ticket = await admit_agent_run()
+            try:
+                # Deadline and step/tool call budget for this run, counted from admission
+                config = run_config(thread_id, new_thread=first_turn)
+                
+                result = await graph.ainvoke({'messages': messages}, config=config)
+            finally:
+                ticket.release()
             
             if result and 'messages' in result and result['messages']:
-                return result['messages'][-1].content
+                response = result['messages'][-1].content
+                budget = budget_report(result['messages'][-1])
+                if budget:
+                    return response, {"budget": budget}
+                if first_turn:
+                    answer_cache.put(query, response, result["messages"])
+                return response, {}
             else:
-                return "I apologize, but I couldn't process your request at the moment."
+                return "I apologize, but I couldn't process your request at the moment.", {}
                 
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Real agent error: {e}")
             raise HTTPException(status_code=500, detail=f"Agent processing failed: {str(e)}")
     
-    async def stream_real_agent(query: str, thread_id: str) -> AsyncGenerator[str, None]:
-        """Stream from the real LangGraph agent"""
-        try:
-            messages = [HumanMessage(content=query)]
-            config = {'configurable': {'thread_id': thread_id}}
-            
-            yield f"data: 🤖 Processing with real AI agent...\n\n"
-            await asyncio.sleep(0.5)
-            
-            result = real_graph.invoke({'messages': messages}, config=config)
-            
-            if result and 'messages' in result and result['messages']:
-                response = result['messages'][-1].content
-                
-                # Simulate streaming by breaking response into chunks
-                words = response.split()
-                chunk_size = 5
-                
-                for i in range(0, len(words), chunk_size):
-                    chunk = ' '.join(words[i:i+chunk_size])
-                    yield f"data: {chunk} "
-                    await asyncio.sleep(0.3)
-                
-                yield f"data: \n\n✅ Real agent response complete!\n\n"
-            else:
-                yield f"data: ❌ No response from agent\n\n"
-                
-            yield "data: [DONE]\n\n"
-            
-        except Exception as e:
-            yield f"data: ❌ Error: {str(e)}\n\n"
-            yield "data: [DONE]\n\n"
+    async def stream_real_agent(query: str, thread_id: str, first_turn: bool = True) -> AsyncGenerator[tuple[str, dict], None]:
+        """Stream typed events from the real LangGraph agent, tokens as the LLM produces them"""
+        graph = await agent_graph()
+        # Closing the stream (client disconnect) closes the agent run with it
+        async with aclosing(stream_agent_events(graph, query, thread_id, new_thread=first_turn)) as events:
+            async for event, data in events:
+                yield event, data
     
     # Mock agent functions
     def generate_mock_response(query: str) -> str:
@@ -191,34 +230,30 @@ Production-ready Travel Agent API deployed on Google Cloud Platform.
         
         return "\n".join(response_parts)
     
-    async def stream_mock_response(query: str, thread_id: str) -> AsyncGenerator[str, None]:
-        """Stream mock response"""
-        steps = [
-            "🎭 Starting mock travel search...",
-            "🔍 Analyzing your request...",
-            "✈️ Searching flight databases...",
-            "🏨 Checking hotel availability...",
-            "📊 Comparing prices and options...",
-            "✅ Preparing results..."
-        ]
+    async def stream_mock_response(query: str, thread_id: str) -> AsyncGenerator[tuple[str, dict], None]:
+        """Stream mock response as typed events, with mock tool calls for the searches"""
+        yield RUN_START, {"thread_id": thread_id, "mode": "mock"}
+        
+        query_lower = query.lower()
+        searches = []
+        if "flight" in query_lower or "fly" in query_lower:
+            searches.append("flights_finder")
+        if "hotel" in query_lower or "accommodation" in query_lower:
+            searches.append("hotels_finder")
         
-        for step in steps:
-            yield f"data: {step}\n\n"
+        for i, name in enumerate(searches):
+            call_id = f"mock_{i}"
+            yield TOOL_START_EVENT, {"id": call_id, "name": name, "args": {"query": query}}
             await asyncio.sleep(0.8)
+            yield TOOL_END_EVENT, {"id": call_id, "name": name, "seconds": 0.8, "status": "ok"}
         
         # Stream the actual response
         response = generate_mock_response(query)
-        lines = response.split('\n')
-        
-        for line in lines:
-            if line.strip():
-                yield f"data: {line}\n"
-            else:
-                yield f"data: \n"
+        for line in response.split('\n'):
+            yield TOKEN, {"text": line + "\n"}
             await asyncio.sleep(0.2)
         
-        yield f"data: \n\n🆔 Thread: {thread_id}\n\n"
-        yield "data: [DONE]\n\n"
+        yield FINAL, {"text": response}
     
     # API Endpoints
     @app.get("/")
@@ -234,10 +269,14 @@ Production-ready Travel Agent API deployed on Google Cloud Platform.
                 "frontend": "Add frontend_8002.html to serve the chat interface",
                 "endpoints": {
                     "health": "/health",
+                    "ready": "/ready",
                     "docs": "/docs", 
                     "chat": "/chat",
                     "chat_stream": "/chat/stream",
-                    "status": "/status"
+                    "status": "/status",
+                    "metrics": "/metrics",
+                    "search_flights": "/travel/search/flights",
+                    "search_hotels": "/travel/search/hotels"
                 }
             }
     
@@ -251,6 +290,18 @@ Production-ready Travel Agent API deployed on Google Cloud Platform.
             "version": "1.0.0"
         }
     
+    @app.on_event("startup")
+    async def start_warm_up():
+        """Build the agent and warm connection pools without holding up the server start"""
+        app.state.warm_up = asyncio.create_task(startup.warm_up(build_real_graph))
+    
+    @app.get("/ready")
+    async def readiness_check():
+        """Readiness probe: 200 only once the graph is built and connection pools are warm"""
+        report = startup.report()
+        report["mode"] = "real" if REAL_INTEGRATION else "mock"
+        return JSONResponse(report, status_code=200 if report["ready"] else 503)
+    
     @app.get("/status")
     async def status():
         return {
@@ -267,6 +318,14 @@ Production-ready Travel Agent API deployed on Google Cloud Platform.
             "deployment": "Google Cloud Platform"
         }
     
+    @app.get("/metrics")
+    async def get_metrics():
+        """Cache and upstream counters of the agent components"""
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "metrics": metrics.snapshot()
+        }
+    
     @app.post("/chat")
     async def chat(chat_message: ChatMessage):
         """Simple chat endpoint"""
@@ -274,39 +333,48 @@ Production-ready Travel Agent API deployed on Google Cloud Platform.
         
         try:
             if REAL_INTEGRATION:
-                response = await query_real_agent(chat_message.message, thread_id)
+                response, metadata = await query_real_agent(chat_message.message, thread_id)
                 mode = "real"
             else:
                 await asyncio.sleep(1)
                 response = generate_mock_response(chat_message.message)
+                metadata = {}
                 mode = "mock"
             
             return {
                 "response": response,
                 "thread_id": thread_id,
                 "timestamp": datetime.now().isoformat(),
-                "mode": mode
+                "mode": mode,
+                "metadata": metadata
             }
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
     @app.post("/chat/stream")
-    async def chat_stream(chat_message: ChatMessage):
+    async def chat_stream(chat_message: ChatMessage, request: Request):
         """Streaming chat endpoint"""
         thread_id = str(uuid.uuid4())
+        background = BackgroundTasks()
         
         if REAL_INTEGRATION:
-            generator = stream_real_agent(chat_message.message, thread_id)
+            ticket = await admit_agent_run()
+            generator = ticket.hold(stream_real_agent(chat_message.message, thread_id))
+            # Also releases the slot if the body never starts streaming
+            background.add_task(ticket.aclose)
         else:
             generator = stream_mock_response(chat_message.message, thread_id)
         
         return StreamingResponse(
-            generator,
-            media_type="text/plain",
+            # A closed tab cancels the agent run instead of finishing it for nobody
+            sse_stream(generator, is_disconnected=request.is_disconnected),
+            media_type="text/event-stream",
+            background=background,
             headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
+                **SSE_HEADERS,
                 "Access-Control-Allow-Origin": "*",
                 "X-Thread-ID": thread_id,
                 "X-Mode": "real" if REAL_INTEGRATION else "mock"
@@ -27,13 +27,18 @@ def test_chat():
     print("🤖 Agent Response:")
     print("=" * 50)
     
+    event = None
     for line in response.iter_lines():
         if line:
             line_str = line.decode('utf-8')
-            if line_str.startswith('data: ') and line_str != 'data: [DONE]':
-                data = line_str[6:]  # Remove 'data: ' prefix
-                if data and data != '[DONE]':
-                    print(data, end='', flush=True)
+            if line_str.startswith('event: '):
+                event = line_str[7:]
+            elif line_str.startswith('data: '):
+                data = json.loads(line_str[6:])  # Remove 'data: ' prefix
+                if event == 'token':
+                    print(data['text'], end='', flush=True)
+                elif event in ('tool_start', 'tool_end', 'error'):
+                    print(f"\n[{data['t']:.2f}s {event}] {data.get('name') or data.get('message', '')}", flush=True)
     
     print("\n" + "=" * 50)
 
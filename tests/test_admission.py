@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from agents.admission import Admission, AdmissionRejected
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def main():
+        admission = Admission(limit=1, max_queue=1, queue_timeout=1.0)
+        first = await admission.admit()
+        waiting = asyncio.create_task(admission.admit())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.admit()
+        first.release()
+        second = await waiting
+        second.release()
+        return admission, rejected.value
+
+    admission, rejected = asyncio.run(main())
+    assert rejected.retry_after >= 1
+    stats = admission.stats()
+    assert (stats['admitted'], stats['queued'], stats['rejected'], stats['active']) == (2, 1, 1, 0)
+
+
+def test_queue_wait_times_out():
+    async def main():
+        admission = Admission(limit=1, max_queue=4, queue_timeout=0.05)
+        ticket = await admission.admit()
+        with pytest.raises(AdmissionRejected, match='within'):
+            await admission.admit()
+        ticket.release()
+        # The slot is free again and the timed out waiter left the queue.
+        (await admission.admit()).release()
+        return admission.stats()
+
+    stats = asyncio.run(main())
+    assert (stats['timed_out'], stats['queue_depth'], stats['active']) == (1, 0, 0)
+
+
+def test_released_slot_goes_to_the_oldest_waiter():
+    async def main():
+        admission = Admission(limit=1, max_queue=4, queue_timeout=1.0)
+        ticket = await admission.admit()
+        order = []
+
+        async def run(name):
+            admitted = await admission.admit()
+            order.append(name)
+            admitted.release()
+
+        waiters = [asyncio.create_task(run(name)) for name in ('a', 'b', 'c')]
+        await asyncio.sleep(0)
+        ticket.release()
+        ticket.release()  # a second release must not free another slot
+        await asyncio.gather(*waiters)
+        return order, admission.stats()
+
+    order, stats = asyncio.run(main())
+    assert order == ['a', 'b', 'c'] and stats['active'] == 0
+
+
+def test_hold_releases_when_the_stream_is_closed_early():
+    async def events():
+        for i in range(10):
+            yield i
+
+    async def main():
+        admission = Admission(limit=1, max_queue=0, queue_timeout=1.0)
+        ticket = await admission.admit()
+        stream = ticket.hold(events())
+        assert await stream.__anext__() == 0
+        await stream.aclose()
+        return admission.stats()
+
+    assert asyncio.run(main())['active'] == 0
@@ -0,0 +1,78 @@
+import asyncio
+import random
+import threading
+
+import pytest
+
+from agents.tools.backends import CassetteBackend, parse_latency
+from agents.tools.serpapi_client import SerpApiError
+
+PARAMS = {'engine': 'google_flights', 'departure_id': 'MAD', 'arrival_id': 'AMS', 'api_key': 'secret'}
+
+
+class Live:
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, params, timeout=None):
+        self.calls += 1
+        return {'best_flights': [{'price': 100 + self.calls}]}
+
+    async def asearch(self, params, timeout=None):
+        return self.search(params, timeout)
+
+
+def test_record_then_replay_without_network(tmp_path):
+    live = Live()
+    recorder = CassetteBackend('record', directory=str(tmp_path), live=live)
+    recorded = recorder.search(PARAMS)
+    player = CassetteBackend('replay', directory=str(tmp_path))
+    # The api_key is not part of the fixture, so a replay with another key still matches.
+    assert player.search({**PARAMS, 'api_key': 'other'}) == recorded
+    assert asyncio.run(player.asearch(PARAMS)) == recorded
+    assert live.calls == 1 and 'secret' not in next(tmp_path.iterdir()).read_text()
+    assert (recorder.stats()['recorded'], player.stats()['replayed']) == (1, 2)
+
+
+def test_missing_fixture_fails_like_upstream(tmp_path):
+    player = CassetteBackend('replay', directory=str(tmp_path))
+    with pytest.raises(SerpApiError):
+        player.search(PARAMS)
+    assert player.stats()['missing'] == 1
+
+
+def test_concurrent_recordings_of_one_request(tmp_path):
+    recorder = CassetteBackend('record', directory=str(tmp_path), live=Live())
+    threads = [threading.Thread(target=recorder.search, args=(PARAMS,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [path.suffix for path in tmp_path.iterdir()] == ['.json']
+    assert recorder.stats()['recorded'] == 8
+    CassetteBackend('replay', directory=str(tmp_path)).search(PARAMS)
+
+
+def test_latency_specs():
+    rng = random.Random(0)
+    assert parse_latency(None) is None and parse_latency('') is None
+    assert parse_latency('fixed:0.5')({}) == 0.5
+    assert all(0.2 <= parse_latency('uniform:0.2,0.4', rng)({}) <= 0.4 for _ in range(20))
+    assert parse_latency('lognormal:0,0.5', rng)({}) > 0
+    assert parse_latency('recorded')({'elapsed': 1.25}) == 1.25 and parse_latency('recorded')({}) == 0.0
+    with pytest.raises(ValueError):
+        parse_latency('gaussian:1')
+
+
+def test_seeded_latency_is_reproducible():
+    first = parse_latency('uniform:0,1', random.Random(7))
+    second = parse_latency('uniform:0,1', random.Random(7))
+    assert [first({}) for _ in range(3)] == [second({}) for _ in range(3)]
+
+
+def test_replay_applies_the_latency(tmp_path):
+    CassetteBackend('record', directory=str(tmp_path), live=Live()).search(PARAMS)
+    player = CassetteBackend('replay', directory=str(tmp_path), latency=parse_latency('fixed:-1'))
+    assert player._delay({}) == 0.0
+    player.latency = parse_latency('recorded')
+    assert player._delay({'elapsed': 0.3}) == 0.3
@@ -0,0 +1,57 @@
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agents.budget import RunBudget, budget_report, run_config, turn_usage
+
+
+def step(*call_ids):
+    '''One LLM step calling a tool per id, followed by the tool answers.'''
+    calls = [{'name': 'flights_finder', 'args': {}, 'id': call_id} for call_id in call_ids]
+    return [AIMessage(content='', tool_calls=calls)] + [ToolMessage(content='{}', tool_call_id=i) for i in call_ids]
+
+
+def test_usage_counts_only_the_current_turn():
+    messages = [HumanMessage('earlier'), *step('a', 'b'), AIMessage('answer'), HumanMessage('now'), *step('c')]
+    assert turn_usage(messages) == (1, 1)
+
+
+def test_fresh_turn_has_budget_left():
+    budget = RunBudget(max_steps=3, max_tool_calls=2)
+    assert budget.exhausted([HumanMessage('hi')]) is None
+    assert budget.tool_allowance([HumanMessage('hi')]) == 2
+
+
+def test_last_step_is_forced_to_answer():
+    budget = RunBudget(max_steps=3, max_tool_calls=10)
+    messages = [HumanMessage('hi'), *step('a'), *step('b')]
+    assert budget.exhausted(messages) == 'max_steps'
+    assert budget.report(messages, 'max_steps') == {'exhausted': 'max_steps', 'steps': 3, 'tool_calls': 2}
+
+
+def test_tool_calls_run_out():
+    budget = RunBudget(max_steps=10, max_tool_calls=3)
+    messages = [HumanMessage('hi'), *step('a', 'b')]
+    assert budget.exhausted(messages) is None and budget.tool_allowance(messages) == 1
+    messages += step('c')
+    assert budget.exhausted(messages) == 'max_tool_calls' and budget.tool_allowance(messages) == 0
+
+
+def test_deadline_keeps_the_answer_reserve():
+    budget = RunBudget.from_config(run_config('t', deadline=5, answer_reserve=10))
+    assert budget.exhausted([HumanMessage('hi')]) == 'deadline'
+    assert budget.tool_time() == 1.0
+    assert RunBudget(deadline=time.time() + 60, answer_reserve=10).exhausted([HumanMessage('hi')]) is None
+
+
+def test_from_config_defaults_and_overrides():
+    budget = RunBudget.from_config(run_config('t', max_steps=2))
+    assert budget.max_steps == 2 and budget.max_tool_calls == RunBudget().max_tool_calls
+    assert budget.deadline > time.time()
+    assert RunBudget.from_config(None).deadline is None
+
+
+def test_budget_report_reads_the_final_answer():
+    report = {'exhausted': 'deadline', 'steps': 2, 'tool_calls': 1}
+    assert budget_report(AIMessage('partial', response_metadata={'budget': report})) == report
+    assert budget_report(AIMessage('full')) is None and budget_report(None) is None
@@ -0,0 +1,49 @@
+from agents.tools import cache as cache_module
+from agents.tools.cache import TTLCache, cache_key, engine_ttl
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    cache = TTLCache(maxsize=4)
+    cache.set('k', 'v', ttl=10)
+    assert cache.get('k') == (True, 'v')
+    now[0] += 10
+    assert cache.get('k') == (False, None)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['size']) == (1, 1, 1, 0)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    cache.get('a')
+    cache.set('c', 3, ttl=60)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1) and cache.get('c') == (True, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_zero_ttl_or_size_stores_nothing():
+    cache = TTLCache(maxsize=2)
+    cache.set('k', 'v', ttl=0)
+    assert cache.get('k') == (False, None)
+    disabled = TTLCache(maxsize=0)
+    disabled.set('k', 'v', ttl=60)
+    assert disabled.stats()['size'] == 0
+
+
+def test_cache_key_ignores_api_key_and_normalizes_values():
+    first = cache_key({'engine': 'google_flights', 'departure_id': 'mad ', 'adults': 1,
+                       'return_date': None, 'api_key': 'secret'})
+    second = cache_key({'adults': '1', 'departure_id': 'MAD', 'engine': 'Google_Flights', 'api_key': 'other'})
+    assert first == second and 'secret' not in first
+    assert cache_key({'departure_id': 'MAD', 'adults': 1}) != cache_key({'departure_id': 'MAD', 'adults': 2})
+
+
+def test_engine_ttl_override(monkeypatch):
+    assert engine_ttl('google_flights') < engine_ttl('google_hotels')
+    monkeypatch.setenv('SERPAPI_CACHE_TTL_GOOGLE_FLIGHTS', '5')
+    assert engine_ttl('google_flights') == 5.0
+    assert engine_ttl('unknown_engine') == cache_module.DEFAULT_TTL
@@ -0,0 +1,130 @@
+import asyncio
+import sqlite3
+import time
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from agents.checkpoint import BoundedMemorySaver, WriteBehindSaver
+from agents.checkpoint_store import SqliteCheckpointStore
+
+
+def config(thread_id):
+    return {'configurable': {'thread_id': thread_id, 'checkpoint_ns': ''}}
+
+
+def save(saver, thread_id, turn):
+    latest = saver.get_tuple(config(thread_id))
+    parent = latest.config if latest else config(thread_id)
+    checkpoint = empty_checkpoint()
+    checkpoint['channel_values'] = {'turn': turn}
+    checkpoint['channel_versions'] = {'turn': turn}
+    return saver.put(parent, checkpoint, {'step': turn}, {'turn': turn})
+
+
+def turn(saver, thread_id):
+    latest = saver.get_tuple(config(thread_id))
+    return latest.checkpoint['channel_values']['turn'] if latest else None
+
+
+def savers(path, count=2):
+    # Two savers on one store stand in for two replicas, or a process before and after a restart.
+    return [WriteBehindSaver(SqliteCheckpointStore(str(path)), sweep_interval=0, flush_interval=60)
+            for _ in range(count)]
+
+
+def test_thread_is_replayed_by_another_saver(tmp_path):
+    first, second = savers(tmp_path / 'checkpoints.sqlite')
+    save(first, 't', 1)
+    save(first, 't', 2)
+    first.flush()
+    assert turn(second, 't') == 2
+    assert second.stats()['hydrated_threads'] == 1
+
+
+def test_resident_thread_is_refreshed_when_another_saver_moves_it_on(tmp_path):
+    first, second = savers(tmp_path / 'checkpoints.sqlite')
+    save(first, 't', 1)
+    first.flush()
+    assert turn(second, 't') == 1
+    save(second, 't', 2)  # the conversation moved to the other replica
+    second.flush()
+    assert turn(first, 't') == 2
+    assert first.stats()['refreshed_threads'] == 1
+    save(first, 't', 3)
+    first.flush()
+    assert turn(first, 't') == 3 and first.stats()['refreshed_threads'] == 1  # its own rows are not foreign
+
+
+def test_async_read_syncs_off_the_loop(tmp_path):
+    first, second = savers(tmp_path / 'checkpoints.sqlite')
+    save(first, 't', 1)
+    first.flush()
+    latest = asyncio.run(second.aget_tuple(config('t')))
+    assert latest.checkpoint['channel_values']['turn'] == 1
+    assert asyncio.run(second.aget_tuple(config('new'))) is None
+
+
+def test_store_keeps_only_the_latest_checkpoint_and_its_writes(tmp_path):
+    path = tmp_path / 'checkpoints.sqlite'
+    first, second = savers(path)
+    for step in range(1, 6):
+        saved = save(first, 't', step)
+        first.put_writes(saved, [('turn', step * 10)], task_id=f'task-{step}')
+        first.flush()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM checkpoints').fetchone()[0] == 1
+        assert conn.execute('SELECT COUNT(*) FROM checkpoint_writes').fetchone()[0] == 1
+    latest = second.get_tuple(config('t'))
+    assert latest.checkpoint['channel_values'] == {'turn': 5}
+    assert latest.pending_writes == [('task-5', 'turn', 50)]
+
+
+def test_batch_writes_only_its_last_checkpoint(tmp_path):
+    first, second = savers(tmp_path / 'checkpoints.sqlite')
+    rows = []
+    first.store.save = lambda batch, writer: rows.extend(batch)
+    for step in range(1, 4):
+        save(first, 't', step)
+    first.flush()
+    assert len(rows) == 3  # coalescing happens in the store, within one transaction
+    del first.store.save
+    first.store.save(rows, first.writer)
+    assert turn(second, 't') == 3
+
+
+def test_new_thread_skips_the_store(tmp_path):
+    first, = savers(tmp_path / 'checkpoints.sqlite', count=1)
+    lookups = []
+    heads = first.store.heads
+    first.store.heads = lambda thread_id: lookups.append(thread_id) or heads(thread_id)
+    new = {'configurable': {**config('fresh')['configurable'], 'new_thread': True}}
+    assert first.get_tuple(new) is None
+    first.put(new, empty_checkpoint(), {'step': 1}, {})
+    assert first.get_tuple(new) is not None and lookups == []
+    first.get_tuple(config('fresh'))  # later turns check the store for other writers again
+    assert lookups == ['fresh']
+
+
+def test_bounded_saver_evicts_least_recently_used_threads():
+    saver = BoundedMemorySaver(max_threads=2, sweep_interval=0)
+    for thread_id in ('a', 'b'):
+        save(saver, thread_id, 1)
+    turn(saver, 'a')  # b is now the least recently used
+    save(saver, 'c', 1)
+    assert turn(saver, 'b') is None and turn(saver, 'a') == 1
+    assert saver.stats()['evicted_lru'] == 1
+
+
+def test_bounded_saver_keeps_the_active_thread_over_the_byte_budget():
+    saver = BoundedMemorySaver(max_bytes=1, sweep_interval=0)
+    save(saver, 'a', 1)
+    save(saver, 'b', 1)
+    assert turn(saver, 'a') is None and turn(saver, 'b') == 1
+
+
+def test_bounded_saver_sweeps_idle_threads():
+    saver = BoundedMemorySaver(idle_ttl=0.01, sweep_interval=0)
+    save(saver, 'a', 1)
+    time.sleep(0.02)
+    assert saver.sweep() == 1 and turn(saver, 'a') is None
+    assert saver.stats()['evicted_idle'] == 1
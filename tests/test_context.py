@@ -0,0 +1,49 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agents.context import ContextPolicy, compact_messages, estimate_tokens
+
+
+def turn(query, call_id, result_chars):
+    return [
+        HumanMessage(query),
+        AIMessage('', tool_calls=[{'name': 'flights_finder', 'args': {}, 'id': call_id}]),
+        ToolMessage('x' * result_chars, tool_call_id=call_id, name='flights_finder'),
+        AIMessage('answer'),
+    ]
+
+
+def tokens(messages):
+    return sum(estimate_tokens(m) for m in messages)
+
+
+def test_small_conversation_is_unchanged():
+    messages = turn('first', 'a', 100) + turn('second', 'b', 100)
+    assert compact_messages(messages, ContextPolicy(max_tokens=10_000, window_turns=6)) == messages
+
+
+def test_earlier_turns_are_digested_and_the_current_one_is_not():
+    messages = turn('first', 'a', 2000) + turn('second', 'b', 2000)
+    view = compact_messages(messages, ContextPolicy(max_tokens=10_000, window_turns=6, digest_chars=50))
+    assert 'chars trimmed' in view[2].content and view[6] == messages[6]
+
+
+def test_old_turns_are_dropped_whole_to_fit():
+    messages = turn('first', 'a', 4000) + turn('second', 'b', 4000) + turn('third', 'c', 400)
+    policy = ContextPolicy(max_tokens=200, window_turns=6, digest_chars=200)
+    view = compact_messages(messages, policy)
+    assert isinstance(view[0], HumanMessage) and tokens(view) <= policy.max_tokens
+    assert view[-4:] == messages[-4:]
+    assert compact_messages(messages, ContextPolicy(window_turns=1))[0].content == 'third'
+
+
+def test_an_oversized_current_turn_is_digested_to_fit():
+    messages = turn('first', 'a', 400) + [HumanMessage('second')]
+    for call_id in 'bcd':
+        messages += turn('', call_id, 4000)[1:3]
+    policy = ContextPolicy(max_tokens=1500, window_turns=6, digest_chars=200)
+    view = compact_messages(messages, policy)
+    assert view[0].content == 'second' and tokens(view) <= policy.max_tokens
+    results = [m for m in view if isinstance(m, ToolMessage)]
+    # Oldest results go first; the newest is kept whole while the rest fits.
+    assert ['chars trimmed' in m.content for m in results] == [True, True, False]
+    assert [m.tool_call_id for m in results] == ['b', 'c', 'd']
@@ -0,0 +1,24 @@
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agents.fake_llm import ScriptedChatModel
+
+
+def test_unknown_placeholders_fail_when_the_script_loads(tmp_path):
+    script = tmp_path / 'script.json'
+    script.write_text(json.dumps([
+        {'tool_calls': [{'name': 'flights_finder', 'args': {'params': {'departure_airport': '{orign}'}}}]},
+        {'text': 'From {origin} for {pax} people'},
+    ]))
+    with pytest.raises(ValueError) as error:
+        ScriptedChatModel.from_env(str(script))
+    assert 'orign' in str(error.value) and 'pax' in str(error.value)
+
+
+def test_placeholders_are_filled_from_the_message():
+    model = ScriptedChatModel()
+    message = model.invoke([HumanMessage('from MAD to AMS Oct 1-7 for 2 adults')])
+    params = message.tool_calls[0]['args']['params']
+    assert (params['departure_airport'], params['arrival_airport'], params['adults']) == ('MAD', 'AMS', 2)
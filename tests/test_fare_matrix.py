@@ -0,0 +1,35 @@
+import pytest
+
+from agents.tools import fare_matrix
+from agents.tools.fare_matrix import FareMatrixInput, _date_pairs, _fare_matrix, _within_budget
+
+
+def window(outbound_to, return_from=None, return_to=None):
+    return FareMatrixInput(departure_airport='MAD', arrival_airport='AMS', outbound_date_from='2025-10-01',
+                           outbound_date_to=outbound_to, return_date_from=return_from, return_date_to=return_to)
+
+
+def test_return_dates_never_precede_outbound():
+    pairs = _date_pairs(window('2025-10-03', '2025-10-02', '2025-10-04'))
+    assert all(back >= out for out, back in pairs) and len(pairs) == 8
+
+
+def test_long_windows_are_rejected_before_enumerating():
+    with pytest.raises(ValueError, match='longer than'):
+        _date_pairs(window('2026-10-01'))
+    with pytest.raises(ValueError, match='longer than'):
+        _date_pairs(window('2025-10-02', '2025-10-05', '2027-01-01'))
+    with pytest.raises(ValueError, match='ends before'):
+        _date_pairs(window('2025-09-01'))
+
+
+def test_the_tool_reports_a_bad_window_instead_of_searching(monkeypatch):
+    monkeypatch.setattr(fare_matrix, 'search', lambda params: pytest.fail('searched'))
+    assert 'longer than' in _fare_matrix(window('2026-10-01'))
+
+
+def test_budget_spreads_over_the_grid_and_zero_searches_nothing():
+    pairs = list(range(10))
+    assert _within_budget(pairs, 5) == [0, 2, 4, 6, 8]
+    assert _within_budget(pairs, 20) == pairs
+    assert _within_budget(pairs, 0) == []
@@ -0,0 +1,49 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from agents.budget import run_config
+from agents.graph import create_graph
+from agents.tools import backends, cache
+
+QUERY = 'flights from MAD to AMS 2030-10-01 to 2030-10-07'
+
+
+class Backend:
+    def __init__(self):
+        self.sync_calls = 0
+        self.async_calls = 0
+
+    def search(self, params, timeout=None):
+        self.sync_calls += 1
+        return {'best_flights': [{'price': 120, 'flights': [{'airline': 'KLM'}]}]}
+
+    async def asearch(self, params, timeout=None):
+        self.async_calls += 1
+        return {'best_flights': [{'price': 120, 'flights': [{'airline': 'KLM'}]}]}
+
+    def stats(self):
+        return {}
+
+
+def summary(messages):
+    return [(type(m).__name__, m.content, [call['name'] for call in getattr(m, 'tool_calls', [])])
+            for m in messages]
+
+
+def test_ainvoke_matches_invoke_and_stays_on_the_loop(monkeypatch):
+    backend = Backend()
+    monkeypatch.setattr(backends, '_backend', backend)
+    graph = create_graph()
+    config = run_config('sync', planner_model='fake')
+
+    monkeypatch.setattr(cache, '_result_cache', cache.TieredCache(cache.TTLCache()))
+    sync = graph.invoke({'messages': [HumanMessage(QUERY)]}, config)['messages']
+    monkeypatch.setattr(cache, '_result_cache', cache.TieredCache(cache.TTLCache()))
+    config = run_config('async', planner_model='fake')
+    asynchronous = asyncio.run(graph.ainvoke({'messages': [HumanMessage(QUERY)]}, config))['messages']
+
+    assert summary(sync) == summary(asynchronous)
+    assert [m.content for m in asynchronous if isinstance(m, ToolMessage)][0].startswith('{"flights"')
+    # The async run used the awaitable search, not a worker thread.
+    assert (backend.sync_calls, backend.async_calls) == (1, 1)
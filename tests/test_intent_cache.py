@@ -0,0 +1,75 @@
+import datetime
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agents.intent_cache import AnswerCache, extract_slots, tools_succeeded
+from agents.prefetch import speculative_searches
+
+TODAY = datetime.date(2025, 9, 1)
+
+
+def key(query):
+    slots = extract_slots(query, TODAY)
+    return slots.key(TODAY) if slots else None
+
+
+def turn(*results):
+    messages = [HumanMessage('MAD to AMS Oct 1-7'), AIMessage('', tool_calls=[
+        {'name': 'flights_finder', 'args': {}, 'id': f'c{i}'} for i in range(len(results))])]
+    for i, (content, status) in enumerate(results):
+        messages.append(ToolMessage(content, tool_call_id=f'c{i}', name='flights_finder',
+                                    response_metadata={'status': status}))
+    return messages
+
+
+def test_direction_is_parsed_not_positional():
+    forward = extract_slots('flights from MAD to AMS Oct 1-7', TODAY)
+    assert (forward.origin, forward.destination) == ('MAD', 'AMS')
+    reverse = extract_slots('flights to MAD from AMS Oct 1-7', TODAY)
+    assert (reverse.origin, reverse.destination) == ('AMS', 'MAD')
+    assert key('flights to MAD from AMS Oct 1-7') != key('MAD to AMS Oct 1-7')
+    assert key('MAD → AMS Oct 1-7') == key('from MAD to AMS Oct 1-7')
+
+
+def test_route_without_direction_is_not_cached():
+    assert extract_slots('MAD AMS Oct 1-7', TODAY) is None
+    assert extract_slots('from MAD to AMS via LHR Oct 1-7', TODAY) is None
+    assert extract_slots('from MAD from AMS Oct 1-7', TODAY) is None
+
+
+def test_unparsed_qualifiers_are_not_cached():
+    base = 'flights from MAD to AMS Oct 1-7'
+    assert key(base) is not None
+    for qualifier in ('business class', 'first class', 'nonstop', 'direct only', 'with an infant',
+                      'under $500', '2 rooms', 'on KLM', 'returning Oct 9'):
+        assert extract_slots(f'{base} {qualifier}', TODAY) is None, qualifier
+
+
+def test_parsed_constraints_are_in_the_key():
+    assert key('from MAD to AMS Oct 1-7 for 2 adults') != key('from MAD to AMS Oct 1-7')
+    assert key('from MAD to AMS Oct 1-7 for 2 adults and 1 child') != key('from MAD to AMS Oct 1-7 for 2 adults')
+    assert key('hotels and flights from MAD to AMS Oct 1-7, 4-star') != key(
+        'hotels and flights from MAD to AMS Oct 1-7, 5-star')
+
+
+def test_failed_tool_calls_are_not_cached():
+    ok = json.dumps({'flights': []})
+    assert tools_succeeded(turn((ok, 'ok')))
+    assert not tools_succeeded(turn((ok, 'ok'), ('flights_finder timed out after 20s', 'timeout')))
+    assert not tools_succeeded(turn(('Circuit open for google_flights', 'ok')))
+    assert not tools_succeeded(turn((ok, 'ok'), ('skipped', 'skipped')))
+
+    cache = AnswerCache()
+    query = 'flights from MAD to AMS Oct 1-7'
+    cache.put(query, 'Sorry, the flight search is unavailable.', turn(('Circuit open', 'ok')))
+    assert cache.get(query) is None
+    cache.put(query, 'KLM, $120', turn((ok, 'ok')))
+    assert cache.get(query) == 'KLM, $120'
+    assert cache.stats()['partial'] == 1
+
+
+def test_prefetch_searches_the_requested_direction():
+    [params] = speculative_searches([HumanMessage('flights to MAD from AMS Oct 1-7')])
+    assert (params['departure_id'], params['arrival_id']) == ('AMS', 'MAD')
+    assert speculative_searches([HumanMessage('flights from MAD to AMS Oct 1-7, business class')]) == []
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+from langchain_core.messages import HumanMessage
+
+from agents import prefetch
+from agents.budget import run_config
+from agents.graph import create_graph
+from agents.prefetch import speculative_searches
+from agents.tools import backends, cache, search
+from agents.tools.speculation import Speculation
+
+QUERY = 'flights from MAD to AMS 2030-10-01 to 2030-10-07'
+
+
+def test_hits_waste_and_errors_are_counted():
+    speculation = Speculation(window=60)
+    assert speculation.start('a') and not speculation.start('a')
+    speculation.claim('a')
+    speculation.claim('a')  # a second real search is not another hit
+    assert speculation.start('b')
+    speculation.failed('b')
+    assert speculation.start('c')
+    assert speculation.stats() == {'started': 3, 'hits': 1, 'wasted': 0, 'errors': 1, 'pending': 1,
+                                   'hit_ratio': 1.0, 'waste_ratio': 0.0}
+    speculation.window = 0
+    stats = speculation.stats()
+    assert (stats['wasted'], stats['pending'], stats['hit_ratio']) == (1, 0, 0.5)
+
+
+def test_only_clear_flight_requests_are_guessed():
+    [params] = speculative_searches([HumanMessage(QUERY)])
+    assert (params['departure_id'], params['arrival_id'], params['outbound_date']) == ('MAD', 'AMS', '2030-10-01')
+    assert speculative_searches([HumanMessage('a hotel in AMS 2030-10-01 to 2030-10-03')]) == []
+    assert speculative_searches([HumanMessage('somewhere warm, cheap')]) == []
+
+
+class Backend:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def search(self, params, timeout=None):
+        with self._lock:
+            self.calls += 1
+        return {'best_flights': []}
+
+    async def asearch(self, params, timeout=None):
+        await asyncio.sleep(0.05)
+        return self.search(params)
+
+    def stats(self):
+        return {}
+
+
+def test_prefetched_search_serves_the_tool_call(monkeypatch):
+    backend = Backend()
+    monkeypatch.setattr(backends, '_backend', backend)
+    monkeypatch.setattr(cache, '_result_cache', cache.TieredCache(cache.TTLCache()))
+    monkeypatch.setattr(search, 'speculation', Speculation())
+    monkeypatch.setattr(prefetch, 'speculation', search.speculation)
+    config = run_config('t', planner_model='fake', prefetch=True)
+    asyncio.run(create_graph().ainvoke({'messages': [HumanMessage(QUERY)]}, config))
+    stats = search.speculation.stats()
+    assert backend.calls == 1 and (stats['started'], stats['hits'], stats['pending']) == (1, 1, 0)
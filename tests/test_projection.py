@@ -0,0 +1,60 @@
+from agents.tools.projection import ProjectionStats, compact_dumps, project_flights, project_hotels
+
+FLIGHTS = {
+    'search_metadata': {'id': 'abc', 'google_flights_url': 'https://flights.example/mad-ams'},
+    'best_flights': [{
+        'price': 120,
+        'type': 'Round trip',
+        'total_duration': 250,
+        'airline_logo': 'https://logo.example/kl.png',
+        'carbon_emissions': {'this_flight': 95000},
+        'flights': [
+            {'airline': 'KLM', 'travel_class': 'Economy', 'flight_number': 'KL 1702',
+             'departure_airport': {'id': 'MAD', 'time': '2030-10-01 07:00', 'name': 'Barajas'},
+             'arrival_airport': {'id': 'CDG', 'time': '2030-10-01 09:00'}},
+            {'airline': 'KLM', 'flight_number': 'KL 1230',
+             'departure_airport': {'id': 'CDG', 'time': '2030-10-01 10:00'},
+             'arrival_airport': {'id': 'AMS', 'time': '2030-10-01 11:10'}},
+        ],
+        'layovers': [{'id': 'CDG', 'name': 'Charles de Gaulle', 'duration': 60}],
+    }],
+}
+
+
+def test_compact_dumps_has_no_padding():
+    assert compact_dumps({'city': 'Zürich', 'legs': [1, 2]}) == '{"city":"Zürich","legs":[1,2]}'
+
+
+def test_flight_keeps_what_the_answer_shows():
+    assert project_flights(FLIGHTS) == {
+        'link': 'https://flights.example/mad-ams',
+        'flights': [{
+            'price': 120, 'type': 'Round trip', 'duration': 250, 'airline': 'KLM',
+            'logo': 'https://logo.example/kl.png', 'class': 'Economy',
+            'depart': 'MAD 2030-10-01 07:00', 'arrive': 'AMS 2030-10-01 11:10',
+            'flights': ['KL 1702', 'KL 1230'], 'stops': ['CDG'],
+        }],
+    }
+    assert project_flights({}) == {}
+
+
+def test_hotel_drops_empty_fields_and_caps_amenities():
+    [hotel] = project_hotels([{
+        'name': 'Canal House', 'link': '', 'images': [{'thumbnail': 'https://img.example/1.jpg'}],
+        'overall_rating': 4.6, 'rate_per_night': {'lowest': '$210'}, 'total_rate': {},
+        'amenities': [f'amenity {i}' for i in range(12)], 'nearby_places': [{'name': 'Dam Square'}],
+    }])
+    assert hotel == {
+        'name': 'Canal House', 'logo': 'https://img.example/1.jpg', 'rating': 4.6,
+        'rate_per_night': '$210', 'amenities': [f'amenity {i}' for i in range(8)],
+    }
+
+
+def test_stats_report_the_savings():
+    stats = ProjectionStats()
+    assert stats.stats()['ratio'] == 0.0
+    stats.record(FLIGHTS, project_flights(FLIGHTS))
+    stats.record({'padding': 'x' * 400}, {})
+    report = stats.stats()
+    assert report['results'] == 2 and report['saved_bytes'] == report['raw_bytes'] - report['projected_bytes']
+    assert report['saved_tokens_estimate'] == report['saved_bytes'] // 4 and 0 < report['ratio'] < 1
@@ -0,0 +1,34 @@
+import pytest
+
+from agents.tools.cache import TieredCache, TTLCache
+from agents.tools.redis_cache import RedisCache
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+def test_round_trip_keeps_the_remaining_ttl(client):
+    cache = RedisCache(client)
+    cache.set('k', {'flights': [1, 2]}, ttl=60)
+    hit, value, ttl = cache.lookup('k')
+    assert hit and value == {'flights': [1, 2]} and 0 < ttl <= 60
+
+
+def test_corrupt_entry_is_a_miss(client):
+    cache = RedisCache(client)
+    client.set(cache._key('k'), b'not zlib', px=60_000)
+    assert cache.lookup('k') == (False, None, 0)
+    assert cache.stats()['misses'] == 1 and cache.stats()['errors'] == 1
+
+
+def test_clear_empties_both_tiers_and_spares_other_keys(client):
+    client.set('someone-else', b'1')
+    cache = TieredCache(TTLCache(), RedisCache(client))
+    cache.set('k', [1], ttl=60)
+    cache.clear()
+    assert cache.get('k') == (False, None)
+    assert client.get('someone-else') == b'1'
@@ -0,0 +1,79 @@
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agents.budget import run_config
+from agents.graph import create_graph
+from agents.render import plan_complete
+from agents.tools import backends, cache
+
+FLIGHTS = json.dumps({'flights': []})
+FLIGHTS_ONLY = 'flights from MAD to AMS on 2030-10-01'
+FLIGHTS_AND_HOTEL = 'flights and a hotel from MAD to AMS 2030-10-01 to 2030-10-07'
+
+
+def calls(*ids, name='flights_finder'):
+    return AIMessage('', tool_calls=[{'name': name, 'args': {}, 'id': i} for i in ids])
+
+
+def answer(call_id, name='flights_finder'):
+    return ToolMessage(FLIGHTS, tool_call_id=call_id, name=name)
+
+
+def test_fully_answered_request_is_complete():
+    assert plan_complete([HumanMessage(FLIGHTS_ONLY), calls('a', 'b'), answer('a'), answer('b')])
+
+
+def test_unanswered_call_is_not_complete():
+    assert not plan_complete([HumanMessage(FLIGHTS_ONLY), calls('a', 'b'), answer('a')])
+
+
+def test_two_intent_request_waits_for_its_second_round():
+    flights = [HumanMessage(FLIGHTS_AND_HOTEL), calls('a'), answer('a')]
+    assert not plan_complete(flights)
+    assert plan_complete(flights + [calls('b', name='hotels_finder'), answer('b', name='hotels_finder')])
+
+
+def test_unreadable_request_is_left_to_the_llm():
+    assert not plan_complete([HumanMessage('MAD to AMS, nonstop please'), calls('a'), answer('a')])
+    assert not plan_complete([HumanMessage(FLIGHTS_ONLY)])
+
+
+def test_only_the_current_turn_counts():
+    earlier = [HumanMessage(FLIGHTS_AND_HOTEL), calls('a'), answer('a'), AIMessage('Here you go')]
+    assert plan_complete(earlier + [HumanMessage(FLIGHTS_ONLY), calls('b'), answer('b')])
+    assert not plan_complete(earlier + [HumanMessage(FLIGHTS_AND_HOTEL), calls('b'), answer('b')])
+
+
+class Backend:
+    def __init__(self):
+        self.engines = []
+
+    def search(self, params, timeout=None):
+        self.engines.append(params['engine'])
+        return {}
+
+    async def asearch(self, params, timeout=None):
+        return self.search(params, timeout)
+
+    def stats(self):
+        return {}
+
+
+def test_rendering_waits_for_the_second_step_of_a_plan(tmp_path, monkeypatch):
+    backend = Backend()
+    monkeypatch.setattr(backends, '_backend', backend)
+    monkeypatch.setattr(cache, '_result_cache', cache.TieredCache(cache.TTLCache()))
+    script = tmp_path / 'script.json'
+    script.write_text(json.dumps([
+        {'tool_calls': [{'name': 'flights_finder', 'args': {'params': {
+            'departure_airport': '{origin}', 'arrival_airport': '{destination}',
+            'outbound_date': '{outbound_date}', 'return_date': '{return_date}'}}}]},
+        {'tool_calls': [{'name': 'hotels_finder', 'args': {'params': {
+            'q': '{destination}', 'check_in_date': '{outbound_date}', 'check_out_date': '{return_date}'}}}]},
+        {'text': 'Done'},
+    ]))
+    config = run_config('t', planner_model=f'fake:{script}', render=True)
+    result = create_graph().invoke({'messages': [HumanMessage(FLIGHTS_AND_HOTEL)]}, config)
+    assert backend.engines == ['google_flights', 'google_hotels']
+    assert plan_complete(result['messages'])
@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from agents.tools import resilience
+from agents.tools.resilience import CircuitBreaker, CircuitOpenError, UpstreamGuard, is_upstream_failure
+from agents.tools.serpapi_client import SerpApiError
+
+
+class Backend:
+    '''Search backend that sleeps `delay` seconds, then returns or raises the next scripted outcome.'''
+
+    def __init__(self, *outcomes, delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        outcome = self.outcomes[min(self.calls, len(self.outcomes)) - 1] if self.outcomes else {'ok': True}
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def search(self, params, timeout=None):
+        time.sleep(self.delay)
+        return self._next()
+
+    async def asearch(self, params, timeout=None):
+        await asyncio.sleep(self.delay)
+        return self._next()
+
+
+PARAMS = {'engine': 'google_flights'}
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(window=4, min_calls=4, failure_rate=0.5, cooldown=0.05)
+    for success in (True, True, False, False):
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the probe
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()  # one probe at a time
+    breaker.record(True)
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(window=2, min_calls=2, failure_rate=0.5, cooldown=0.05)
+    breaker.record(False)
+    breaker.record(False)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == 'open' and breaker.opened == 2
+    assert not breaker.allow()
+
+
+def test_cancelled_probe_frees_the_slot_without_closing():
+    guard = UpstreamGuard(hedge=False)
+    breaker = guard._engine('google_flights').breaker
+    breaker.cooldown = 0.0
+    breaker._open()
+
+    async def cancel_probe():
+        probe = asyncio.create_task(guard.asearch(Backend(delay=1.0), PARAMS))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+    assert breaker.state == 'half_open'
+    assert breaker.allow()  # the next probe is let through
+
+
+def test_only_outages_count_as_upstream_failures():
+    assert is_upstream_failure(TimeoutError())
+    assert is_upstream_failure(httpx.ConnectError('refused'))
+    assert is_upstream_failure(SerpApiError('busy', status_code=503))
+    assert is_upstream_failure(SerpApiError('quota', status_code=429))
+    assert not is_upstream_failure(SerpApiError('bad params', status_code=400))
+    assert not is_upstream_failure(SerpApiError("Google hasn't returned any results"))
+    assert not is_upstream_failure(KeyError('flights'))
+    assert not is_upstream_failure(asyncio.CancelledError())
+
+
+def test_guard_rejects_while_open():
+    guard = UpstreamGuard(hedge=False)
+    backend = Backend(SerpApiError('busy', status_code=503))
+    for _ in range(resilience.BREAKER_MIN_CALLS):
+        with pytest.raises(SerpApiError):
+            guard.search(backend, PARAMS)
+    with pytest.raises(CircuitOpenError):
+        guard.search(backend, PARAMS)
+    assert backend.calls == resilience.BREAKER_MIN_CALLS
+
+
+def test_blocking_search_has_a_wall_clock_deadline(monkeypatch):
+    monkeypatch.setenv('SERPAPI_DEADLINE_GOOGLE_FLIGHTS', '0.1')
+    guard = UpstreamGuard(hedge=False)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        guard.search(Backend(delay=1.0), PARAMS)
+    assert time.monotonic() - start < 0.5
+
+
+def test_async_search_has_a_deadline(monkeypatch):
+    monkeypatch.setenv('SERPAPI_DEADLINE_GOOGLE_FLIGHTS', '0.1')
+    guard = UpstreamGuard(hedge=False)
+    with pytest.raises(TimeoutError):
+        asyncio.run(guard.asearch(Backend(delay=1.0), PARAMS))
+
+
+def test_hedge_answers_a_slow_primary(monkeypatch):
+    monkeypatch.setattr(resilience, 'HEDGE_MIN_SAMPLES', 1)
+    guard = UpstreamGuard(hedge=True)
+    guard._engine('google_flights').latencies.append(0.05)
+
+    class SlowFirst(Backend):
+        def search(self, params, timeout=None):
+            self.calls += 1
+            time.sleep(1.0 if self.calls == 1 else 0.0)
+            return {'call': self.calls}
+
+    assert guard.search(SlowFirst(), PARAMS) == {'call': 2}
+    assert guard.stats()['engines']['google_flights']['hedge_wins'] == 1
@@ -0,0 +1,60 @@
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import END
+
+from agents.budget import run_config
+from agents.graph import TravelAgent, create_graph
+from agents.llm import ModelRouting, node_stats
+from agents.tools import backends, cache
+
+CALL = {'name': 'flights_finder', 'args': {}, 'id': 'a'}
+
+
+def state(*messages):
+    return {'messages': [HumanMessage('flights from MAD to AMS on 2030-10-01'), *messages]}
+
+
+def test_routing_defaults_and_overrides():
+    routing = ModelRouting.from_config(run_config('t', synthesis_model='pro'))
+    assert routing.synthesis and routing.answer_model == 'pro'
+    assert routing.planner_model == ModelRouting().planner_model
+    assert ModelRouting.from_config(None) == ModelRouting()
+    assert not ModelRouting(synthesis_model='').synthesis
+
+
+def test_only_a_draft_after_tool_results_goes_to_synthesis():
+    config = run_config('t', synthesis_model='pro')
+    searched = state(AIMessage('', tool_calls=[CALL]), ToolMessage('{}', tool_call_id='a'))
+    assert TravelAgent.exists_action(state(AIMessage('', tool_calls=[CALL])), config) == 'invoke_tools'
+    assert TravelAgent.exists_action({'messages': searched['messages'] + [AIMessage('draft')]}, config) == 'synthesize'
+    # A direct answer, one cut short by the budget, or a run without a synthesis model ends here.
+    assert TravelAgent.exists_action(state(AIMessage('hello')), config) == END
+    budgeted = AIMessage('partial', response_metadata={'budget': {'exhausted': 'deadline'}})
+    assert TravelAgent.exists_action({'messages': searched['messages'] + [budgeted]}, config) == END
+    assert TravelAgent.exists_action({'messages': searched['messages'] + [AIMessage('draft')]}, run_config('t')) == END
+
+
+class Backend:
+    def search(self, params, timeout=None):
+        return {'best_flights': []}
+
+    async def asearch(self, params, timeout=None):
+        return self.search(params)
+
+    def stats(self):
+        return {}
+
+
+def test_synthesis_model_writes_the_answer(tmp_path, monkeypatch):
+    monkeypatch.setattr(backends, '_backend', Backend())
+    monkeypatch.setattr(cache, '_result_cache', cache.TieredCache(cache.TTLCache()))
+    script = tmp_path / 'synthesis.json'
+    script.write_text(json.dumps([{'text': 'Synthesized: {origin} to {destination}'}]))
+    synthesis = f'fake:{script}'
+    config = run_config('t', planner_model='fake', synthesis_model=synthesis)
+    messages = create_graph().invoke(state(), config)['messages']
+    answers = [m for m in messages if isinstance(m, AIMessage) and not m.tool_calls]
+    # The planner's draft was replaced by the synthesis, not appended to.
+    assert [m.content for m in answers] == ['Synthesized: MAD to AMS']
+    assert node_stats.stats()[f'synthesize:{synthesis}']['calls'] == 1
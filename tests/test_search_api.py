@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from agents import search_api
+from agents.tools import flights_finder
+from agents.tools.resilience import CircuitOpenError
+from agents.tools.serpapi_client import SerpApiError
+
+BODY = {'departure_airport': 'MAD', 'arrival_airport': 'AMS', 'outbound_date': '2025-10-01'}
+
+
+def post(body: dict) -> httpx.Response:
+    app = FastAPI()
+    app.include_router(search_api.router)
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+            return await client.post('/travel/search/flights', json=body)
+
+    return asyncio.run(main())
+
+
+def failing(error: Exception):
+    async def find(params):
+        raise error
+    return find
+
+
+@pytest.mark.parametrize('error, status', [
+    (SerpApiError('Rate limited', status_code=429), 429),
+    (SerpApiError('Bad gateway', status_code=502), 502),
+    (TimeoutError('took too long'), 504),
+    (httpx.ReadTimeout('read timed out'), 504),
+    (CircuitOpenError('SerpAPI circuit open'), 503),
+])
+def test_upstream_errors_map_to_statuses(monkeypatch, error, status):
+    monkeypatch.setattr(flights_finder, 'afind_flights', failing(error))
+    assert post(BODY).status_code == status
+
+
+def test_results_and_validation(monkeypatch):
+    async def find(params):
+        return [{'route': f'{params.departure_airport}-{params.arrival_airport}'}]
+
+    monkeypatch.setattr(flights_finder, 'afind_flights', find)
+    response = post(BODY)
+    assert response.status_code == 200 and response.json()['results'] == [{'route': 'MAD-AMS'}]
+    assert post({'departure_airport': 'MAD'}).status_code == 422
@@ -0,0 +1,58 @@
+import asyncio
+
+import httpx
+import pytest
+
+from agents.tools.serpapi_client import SerpApiClient, SerpApiError
+
+
+def transport(seen):
+    def handler(request):
+        seen.append(request)
+        if request.url.params.get('engine') == 'broken':
+            return httpx.Response(401, json={'error': 'Invalid API key'})
+        return httpx.Response(200, json={'best_flights': []})
+
+    return httpx.MockTransport(handler)
+
+
+def test_async_clients_are_reused_per_loop():
+    client = SerpApiClient()
+
+    async def pool():
+        first = client._async_client()
+        assert client._async_client() is first
+        await client.aclose()
+        return first
+
+    first, second = asyncio.run(pool()), asyncio.run(pool())
+    assert first is not second and len(client._async_clients) == 0
+
+
+def test_timeouts_and_query_params():
+    seen = []
+    client = SerpApiClient(timeout=30)
+    client._client = httpx.Client(transport=transport(seen), timeout=client.timeout)
+    assert client.search({'engine': 'google_flights', 'return_date': None}) == {'best_flights': []}
+    client.search({'engine': 'google_flights'}, timeout=2.5)
+    assert [r.extensions['timeout']['read'] for r in seen] == [30, 2.5]
+    assert dict(seen[0].url.params) == {'engine': 'google_flights', 'output': 'json'}
+    client.close()
+
+
+def test_async_search_and_errors():
+    seen = []
+    client = SerpApiClient(timeout=30)
+
+    async def main():
+        client._async_clients[asyncio.get_running_loop()] = httpx.AsyncClient(transport=transport(seen))
+        result = await client.asearch({'engine': 'google_hotels'}, timeout=4)
+        with pytest.raises(SerpApiError, match='Invalid API key') as error:
+            await client.asearch({'engine': 'broken'})
+        await client.aclose()
+        return result, error.value
+
+    result, error = asyncio.run(main())
+    assert result == {'best_flights': []} and error.status_code == 401
+    assert seen[0].extensions['timeout']['read'] == 4
+    assert client.stats() == {'mode': 'live', 'requests': 2, 'errors': 1}
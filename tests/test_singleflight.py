@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.tools.singleflight import SingleFlight
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('k', work))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['result'] * 5 and len(calls) == 1
+    assert flight.stats()['followers'] == 4
+
+
+def test_followers_get_the_leaders_error():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError('upstream broke')
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('k', fail)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=call) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+    assert len(errors) == 4 and all(e is errors[0] for e in errors)
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_follower_wait_is_bounded():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.5)
+        return 'late'
+
+    leader = threading.Thread(target=flight.do, args=('k', slow))
+    leader.start()
+    started.wait()
+    with pytest.raises(TimeoutError):
+        flight.do('k', slow, timeout=0.05)
+    leader.join()
+    assert flight.stats()['follower_timeouts'] == 1
+
+
+def test_async_follower_wait_is_bounded():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.3)
+        return 'late'
+
+    async def main():
+        leader = asyncio.create_task(flight.ado('k', slow))
+        await asyncio.sleep(0)
+        with pytest.raises(TimeoutError):
+            await flight.ado('k', slow, timeout=0.05)
+        return await leader
+
+    assert asyncio.run(main()) == 'late'
+    assert flight.stats()['follower_timeouts'] == 1
+
+
+def test_async_followers_get_the_leaders_error():
+    flight = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError('upstream broke')
+
+    async def main():
+        return await asyncio.gather(*[flight.ado('k', fail) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(calls) == 1 and all(isinstance(r, ValueError) for r in results)
+
+
+def test_nothing_is_remembered_after_the_call():
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do('k', work) == 1 and flight.do('k', work) == 2
+    assert flight.do('other', work) == 3
+    assert flight.stats()['in_flight'] == 0 and flight.stats()['followers'] == 0
+
+
+def test_cancelled_async_follower_leaves_the_shared_search_running():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    async def main():
+        leader = asyncio.create_task(flight.ado('k', work))
+        follower = asyncio.create_task(flight.ado('k', work))
+        await asyncio.sleep(0)
+        follower.cancel()
+        return await leader, follower.cancelled()
+
+    assert asyncio.run(main()) == ('result', True)
+
+
+def test_search_is_cancelled_once_nobody_waits_for_it():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        callers = [asyncio.create_task(flight.ado('k', work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        callers[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled  # the other caller still waits
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert cancelled == [1] and flight.stats()['abandoned'] == 1
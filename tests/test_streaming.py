@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from agents.budget import run_config
+from agents.graph import create_graph
+from agents.streaming import sse_event, sse_stream, stream_agent_events
+from agents.tools import backends, cache
+
+
+class Backend:
+    '''SerpAPI stand-in whose searches take `delay` seconds and record how they ended.'''
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.started = asyncio.Event()
+        self.finished = 0
+        self.cancelled = 0
+
+    async def asearch(self, params, timeout=None):
+        self.started.set()
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.finished += 1
+        return {'best_flights': []}
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def fresh_search(monkeypatch):
+    monkeypatch.setattr(cache, '_result_cache', cache.TieredCache(cache.TTLCache()))
+
+    def use(backend):
+        monkeypatch.setattr(backends, '_backend', backend)
+        return backend
+
+    return use
+
+
+async def collect(stream):
+    return [frame async for frame in stream]
+
+
+def parse(frame):
+    fields = dict(line.split(': ', 1) for line in frame.strip().split('\n'))
+    return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+
+def test_sse_event_framing():
+    frame = sse_event('token', {'text': 'two\nlines'}, 3)
+    assert frame == 'id: 3\nevent: token\ndata: {"text": "two\\nlines"}\n\n'
+    assert parse(frame) == (3, 'token', {'text': 'two\nlines'})
+
+
+def test_stream_numbers_events_and_ends_with_done():
+    async def events():
+        yield 'run_start', {'thread_id': 't'}
+        yield 'token', {'text': 'hi'}
+
+    frames = [parse(frame) for frame in asyncio.run(collect(sse_stream(events())))]
+    assert [(i, event) for i, event, _ in frames] == [(1, 'run_start'), (2, 'token'), (3, 'done')]
+    assert all(data['t'] >= 0 for _, _, data in frames)
+
+
+def test_idle_stream_sends_heartbeats():
+    async def events():
+        await asyncio.sleep(0.2)
+        yield 'final', {'answer': 'ok'}
+
+    frames = asyncio.run(collect(sse_stream(events(), heartbeat=0.05)))
+    assert frames.count(': heartbeat\n\n') >= 2
+    assert [parse(frame)[1] for frame in frames if frame.startswith('id:')] == ['final', 'done']
+
+
+def test_failure_becomes_an_error_event_before_done():
+    async def events():
+        yield 'token', {'text': 'partial'}
+        raise RuntimeError('LLM quota exceeded')
+
+    frames = [parse(frame) for frame in asyncio.run(collect(sse_stream(events())))]
+    assert [event for _, event, _ in frames] == ['token', 'error', 'done']
+    assert frames[1][2]['message'] == 'LLM quota exceeded'
+
+
+def test_disconnect_mid_search_cancels_upstream_and_keeps_the_thread_usable(fresh_search):
+    async def main():
+        graph = create_graph()
+        slow = fresh_search(Backend(delay=5.0))
+        disconnected = False
+
+        async def is_disconnected():
+            return disconnected
+
+        events = stream_agent_events(graph, 'flights from MAD to AMS', 't',
+                                     run_config('t', planner_model='fake'))
+        frames = []
+        async for frame in sse_stream(events, heartbeat=0.05, is_disconnected=is_disconnected):
+            frames.append(frame)
+            if 'event: tool_start' in frame:
+                await slow.started.wait()
+                disconnected = True
+        assert not any('event: done' in frame for frame in frames)
+        assert (slow.finished, slow.cancelled) == (0, 1)
+
+        config = run_config('t', planner_model='fake')
+        closed = (await graph.aget_state(config)).values['messages'][-1]
+        assert isinstance(closed, ToolMessage) and closed.response_metadata['status'] == 'cancelled'
+
+        fast = fresh_search(Backend())
+        result = await graph.ainvoke({'messages': [HumanMessage('flights from MAD to AMS')]}, config)
+        return result['messages'], fast
+
+    messages, fast = asyncio.run(main())
+    assert fast.finished == 1 and messages[-1].content.startswith('Here are the best flights')
+    calls = [call['id'] for m in messages for call in getattr(m, 'tool_calls', [])]
+    answered = [m.tool_call_id for m in messages if isinstance(m, ToolMessage)]
+    assert sorted(calls) == sorted(answered)
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import time
+
+from langchain_core.tools import StructuredTool
+
+from agents.tool_executor import arun_tool_calls, run_tool_calls
+
+
+def sleeper(seconds: float) -> dict:
+    '''Sleep, then report how long.'''
+    time.sleep(seconds)
+    return {'slept': seconds}
+
+
+async def asleeper(seconds: float) -> dict:
+    await asyncio.sleep(seconds)
+    return {'slept': seconds}
+
+
+def broken(seconds: float) -> dict:
+    '''Always fails.'''
+    raise RuntimeError('upstream 500')
+
+
+SYNC = {'sleep': StructuredTool.from_function(sleeper, name='sleep'),
+        'broken': StructuredTool.from_function(broken, name='broken')}
+ASYNC = {'sleep': StructuredTool.from_function(sleeper, coroutine=asleeper, name='sleep'),
+         'broken': SYNC['broken']}
+
+
+def call(call_id, seconds, name='sleep'):
+    return {'name': name, 'args': {'seconds': seconds}, 'id': call_id}
+
+
+def test_calls_run_concurrently_and_answer_in_order():
+    calls = [call('a', 0.2), call('b', 0.0), call('c', 0.1)]
+    start = time.perf_counter()
+    messages = run_tool_calls(SYNC, calls)
+    assert time.perf_counter() - start < 0.35
+    assert [m.tool_call_id for m in messages] == ['a', 'b', 'c']
+    assert json.loads(messages[0].content) == {'slept': 0.2}
+    assert [m.tool_call_id for m in asyncio.run(arun_tool_calls(ASYNC, calls))] == ['a', 'b', 'c']
+
+
+def test_timeouts_and_failures_become_messages():
+    calls = [call('a', 1.0), call('b', 0.0, name='broken'), call('c', 0.0, name='missing'), call('d', 0.0)]
+    for messages in (run_tool_calls(SYNC, calls, timeout=0.1),
+                     asyncio.run(arun_tool_calls(ASYNC, calls, timeout=0.1))):
+        assert [m.response_metadata['status'] for m in messages] == ['timeout', 'error', 'ok', 'ok']
+        assert 'timed out after 0.1s' in messages[0].content and 'upstream 500' in messages[1].content
+        assert messages[2].content == 'bad tool name, retry'
+
+
+def test_results_are_reported_as_they_finish():
+    finished = []
+
+    async def on_result(message):
+        finished.append(message.tool_call_id)
+
+    messages = asyncio.run(arun_tool_calls(ASYNC, [call('a', 0.1), call('b', 0.0)], on_result=on_result))
+    assert finished == ['b', 'a'] and [m.tool_call_id for m in messages] == ['a', 'b']
+
+
+def test_cancelling_the_turn_cancels_its_calls():
+    cancelled = []
+
+    async def slow(seconds: float) -> dict:
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            cancelled.append(seconds)
+            raise
+        return {}
+
+    tools = {'sleep': StructuredTool.from_function(sleeper, coroutine=slow, name='sleep')}
+
+    async def main():
+        turn = asyncio.create_task(arun_tool_calls(tools, [call('a', 5.0), call('b', 6.0)]))
+        await asyncio.sleep(0.05)
+        turn.cancel()
+        await asyncio.gather(turn, return_exceptions=True)
+        return turn.cancelled()
+
+    assert asyncio.run(main()) and sorted(cancelled) == [5.0, 6.0]
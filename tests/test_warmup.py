@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+from agents.warmup import Startup
+
+
+def test_phases_are_timed_and_reported():
+    startup = Startup()
+    with startup.phase('import fastapi'):
+        time.sleep(0.01)
+    report = startup.report()
+    assert report['phases']['import fastapi'] >= 0.01
+    assert (report['ready'], report['ready_after'], report['error']) == (False, None, None)
+
+
+def test_requests_wait_for_warm_up():
+    async def main():
+        startup = Startup()
+        assert not await startup.wait_ready(0.01)
+        waiting = asyncio.create_task(startup.wait_ready(5))
+        await startup.warm_up(lambda: None)
+        return startup, await waiting
+
+    startup, ready = asyncio.run(main())
+    report = startup.report()
+    assert ready and report['ready'] and report['ready_after'] is not None
+    assert {'build agent', 'warm connection pools'} <= set(report['phases'])
+
+
+def test_failed_warm_up_still_unblocks_with_the_error():
+    def build():
+        raise RuntimeError('no GOOGLE_API_KEY')
+
+    async def main():
+        startup = Startup()
+        await startup.warm_up(build)
+        return startup, await startup.wait_ready(0.01)
+
+    startup, ready = asyncio.run(main())
+    assert ready and startup.report()['error'] == 'no GOOGLE_API_KEY'
+    assert 'warm connection pools' not in startup.report()['phases']